@@ -1,21 +1,39 @@
 """
 NeuroArc - FastAPI Backend
 AI-powered job application assistant
+
+Run with the uvloop event loop and httptools HTTP parser:
+    uvicorn main:app --loop uvloop --http httptools
 """
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from pathlib import Path
+import anyio
+import asyncio
+import atexit
 import os
+import queue
 import logging
+import logging.handlers
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Records are handed to a background thread through a queue so slow log I/O never blocks a request
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Only merges args; log_handler adds the full format
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+log_listener.start()
+atexit.register(log_listener.stop)  # Flush queued records on exit
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -23,45 +41,90 @@ load_dotenv()
 
 # Import routers
 from routers import jobs, cv, reviews
+from services.cv_store import cv_store
+from services.ai_service import ai_service
+from services.job_service import job_service
+
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "100"))
+
+# Dependency status is fixed for the life of the process, so build the health payload once
+HEALTH_STATUS = {
+    "status": "healthy",
+    "dependencies": {
+        "ai_service": "available" if os.getenv("GITHUB_TOKEN", "") else "unavailable (no GITHUB_TOKEN)",
+        "job_search": "available" if os.getenv("REED_API_KEY", "") else "mock mode (no REED_API_KEY)"
+    }
+}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
     logger.info("🚀 NeuroArc Backend starting...")
+    # Blocking work (file I/O, parsing, PDF rendering) is offloaded to anyio's threadpool; raise its default of 40
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # Build the OpenAPI schema (and every request model's JSON schema) now rather than on first /docs hit
+    app.openapi()
+    # Connect to the AI endpoint in the background so startup isn't held up by the handshake
+    warmup_task = asyncio.create_task(ai_service.warmup())
     yield
     logger.info("👋 NeuroArc Backend shutting down...")
+    warmup_task.cancel()
+    await cv_store.aclose()
+    await ai_service.aclose()
+    await job_service.aclose()
 
 app = FastAPI(
     title="NeuroArc",
     description="AI-powered job application assistant - Find jobs, generate tailored CVs",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# CORS configuration - Allow common development and production origins
-allowed_origins = [
+# Check if frontend build exists (Production/Docker mode)
+frontend_dist = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "dist")
+serving_frontend = os.path.exists(frontend_dist)
+
+# CORS configuration
+# When the built frontend is served by this app, requests are same-origin and need no CORS
+# unless extra origins are configured; in dev mode allow the local Vite/React dev servers
+dev_origins = () if serving_frontend else (
     "http://localhost:5173",
     "http://127.0.0.1:5173",
     "http://localhost:3000",
     "http://127.0.0.1:3000",
-]
+)
 
 # Add custom origins from environment if provided
-custom_origins = os.getenv("CORS_ORIGINS", "").split(",")
-allowed_origins.extend([origin.strip() for origin in custom_origins if origin.strip()])
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+custom_origins = tuple(
+    origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()
 )
+allowed_origins = dev_origins + custom_origins
+
+# Middleware runs in reverse order of registration: CORS is added first so it sits inside
+# the proxy-header middleware, and is skipped entirely when no cross-origin access is needed
+if allowed_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+# Compress JSON responses (job search results, parsed CVs); small payloads are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # Trust X-Forwarded headers from proxies (Hugging Face Spaces)
-# This ensures the app knows it's being served over HTTPS
+# This ensures the app knows it's being served over HTTPS. Set FORWARDED_ALLOW_IPS to the proxy's
+# address(es) where they are known: request.client (the rate-limit key) comes from X-Forwarded-For
+# only for trusted proxies, and trusting any ("*") lets a client choose its own address
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=["*"])
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=os.getenv("FORWARDED_ALLOW_IPS") or "*")
+
+# Rate limiting (used by the review admin endpoints)
+app.state.limiter = reviews.limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 # Include routers
 app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
@@ -69,13 +132,18 @@ app.include_router(cv.router, prefix="/api/cv", tags=["CV"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["Reviews"])
 
 # Static Files & Frontend Serving
-# Check if frontend build exists (Production/Docker mode)
-frontend_dist = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "dist")
-
-if os.path.exists(frontend_dist):
+if serving_frontend:
     # Serve assets (JS, CSS, Images)
     app.mount("/assets", StaticFiles(directory=os.path.join(frontend_dist, "assets")), name="assets")
     
+    # Snapshot the build output once at startup so the SPA fallback needs no per-request stat() calls
+    static_files = frozenset(
+        p.relative_to(frontend_dist).as_posix()
+        for p in Path(frontend_dist).rglob("*") if p.is_file()
+    )
+    with open(os.path.join(frontend_dist, "index.html"), "rb") as f:
+        index_html = f.read()
+    
     # Catch-all for React Router - serves index.html for non-API routes
     @app.middleware("http")
     async def spa_middleware(request: Request, call_next):
@@ -84,12 +152,12 @@ if os.path.exists(frontend_dist):
             return await call_next(request)
             
         # Try to serve static file if it exists directly (e.g., favicon.svg)
-        full_path = os.path.join(frontend_dist, request.url.path.lstrip("/"))
-        if os.path.exists(full_path) and os.path.isfile(full_path):
-            return FileResponse(full_path)
+        rel_path = request.url.path.lstrip("/")
+        if rel_path in static_files:
+            return FileResponse(os.path.join(frontend_dist, rel_path))
             
-        # Otherwise serve index.html (SPA routing)
-        return FileResponse(os.path.join(frontend_dist, "index.html"))
+        # Otherwise serve the cached index.html (SPA routing)
+        return Response(content=index_html, media_type="text/html")
 
 else:
     # Dev mode / API only
@@ -111,14 +179,4 @@ else:
 @app.get("/health")
 async def health_check():
     """Health check endpoint with dependency status"""
-    github_token = bool(os.getenv("GITHUB_TOKEN", ""))
-    reed_api_key = bool(os.getenv("REED_API_KEY", ""))
-    
-    return {
-        "status": "healthy",
-        "dependencies": {
-            "ai_service": "available" if github_token else "unavailable (no GITHUB_TOKEN)",
-            "job_search": "available" if reed_api_key else "mock mode (no REED_API_KEY)"
-        }
-    }
-
+    return HEALTH_STATUS
@@ -3,41 +3,148 @@ CV Router - API endpoints for CV upload, parsing, and generation
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from fastapi.responses import Response
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict, Any, Awaitable, Callable
+from urllib.parse import quote
 from services.cv_parser import cv_parser
 from services.ai_service import ai_service
 from services.pdf_generator import pdf_generator
-import hashlib
-import time
+from services.cv_store import cv_store
+from cachetools import TTLCache
+import anyio
+import asyncio
+import blake3
+import re
+import os
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Store CV data in memory with timestamps (in production, use database or session storage)
-cv_store = {}
-CV_STORE_MAX_AGE = 3600  # 1 hour in seconds
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB limit
+UPLOAD_CHUNK_SIZE = 64 * 1024
+_ALLOWED_EXTS = frozenset({".pdf", ".docx", ".txt"})
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9 _-]")
+MAX_BATCH_JOBS = 10
 
-def cleanup_old_cvs():
-    """Remove CVs older than CV_STORE_MAX_AGE"""
-    current_time = time.time()
-    expired_keys = [
-        key for key, value in cv_store.items()
-        if current_time - value.get("timestamp", 0) > CV_STORE_MAX_AGE
-    ]
-    for key in expired_keys:
-        del cv_store[key]
-        logger.info(f"Cleaned up expired CV: {key}")
+async def get_stored_cv(cv_id: str) -> Dict[str, Any]:
+    """Fetch stored CV data, raising 404 if it is missing or expired"""
+    cv_data = await cv_store.get(cv_id)
+    if cv_data is None:
+        raise HTTPException(status_code=404, detail="CV not found or expired. Please upload again.")
+    return cv_data
 
 class CVGenerateRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     cv_id: str
     job_title: str
     job_description: str
     company_name: str
     ats_analysis: Optional[Dict[str, Any]] = None
 
+class BatchJob(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
+    job_title: str
+    job_description: str
+    company_name: str = ""
+
+class CVBatchAnalyzeRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
+    cv_id: str
+    jobs: List[BatchJob] = Field(..., min_length=1, max_length=MAX_BATCH_JOBS)
+
+async def _single_flight(inflight: Dict[Any, asyncio.Task], key: Any, make_coro: Callable[[], Awaitable[Any]]) -> Any:
+    """Run make_coro() once per key; concurrent callers with the same key await the same task"""
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(make_coro())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    
+    # Shield the shared task so one client disconnecting does not cancel it for the others
+    return await asyncio.shield(task)
+
+# Uploads of identical bytes currently being parsed, keyed by cv_id
+upload_inflight: Dict[str, asyncio.Task] = {}
+
+# Cache tailored CV JSON so Preview -> Download for the same CV and job costs one LLM call
+GENERATION_CACHE_MAX_AGE = 1800  # 30 minutes in seconds
+generation_cache = TTLCache(maxsize=512, ttl=GENERATION_CACHE_MAX_AGE)
+generation_inflight: Dict[tuple, asyncio.Task] = {}
+
+def _generation_key(request: CVGenerateRequest) -> tuple:
+    """Cache key for a tailored CV: the CV plus a digest of the target job"""
+    job = f"{request.job_title}|{request.company_name}|{request.job_description}"
+    return (request.cv_id, blake3.blake3(job.encode()).digest())
+
+async def _generate_and_cache(key: tuple, request: CVGenerateRequest, cv_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Call the LLM and cache the result on success"""
+    result = await ai_service.generate_tailored_cv_json(
+        cv_text=cv_data["text"],
+        cv_skills=cv_data["skills"],
+        job_title=request.job_title,
+        job_description=request.job_description,
+        company_name=request.company_name,
+        ats_analysis_json=request.ats_analysis,
+        contact_info=cv_data.get("contact"),
+        candidate_name=cv_data.get("name")
+    )
+    if result["success"]:
+        generation_cache[key] = result
+    return result
+
+async def get_tailored_cv_json(request: CVGenerateRequest, cv_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate (or reuse) the tailored CV JSON for a request
+    
+    Concurrent requests for the same key share one in-flight generation (single-flight),
+    so simultaneous Preview/Download clicks make a single LLM call.
+    """
+    key = _generation_key(request)
+    cached = generation_cache.get(key)
+    if cached is not None:
+        logger.info(f"Reusing cached tailored CV for {request.cv_id}")
+        return cached
+    
+    return await _single_flight(generation_inflight, key, lambda: _generate_and_cache(key, request, cv_data))
+
+async def _parse_and_store(cv_id: str, content: bytes, filename: str) -> Dict[str, Any]:
+    """Analyze an uploaded CV and store it on success"""
+    # CPU-bound parsing runs in the threadpool to keep the event loop free
+    result = await anyio.to_thread.run_sync(cv_parser.analyze_cv, content, filename)
+    
+    if result["success"]:
+        # Store for later use (expiry is tracked by the store)
+        await cv_store.set(cv_id, result)
+        logger.info(f"CV uploaded successfully: {cv_id} ({result['skills_count']} skills detected)")
+    
+    return result
+
+def _upload_response(cv_id: str, result: Dict[str, Any], filename: str) -> Dict[str, Any]:
+    """
+    Build the upload response from a parsed CV. The result may come from an earlier upload of
+    the same bytes, so the filename is taken from this request rather than the stored result
+    """
+    return {
+        "success": True,
+        "cv_id": cv_id,
+        "filename": filename,
+        "format": result["format"],
+        "text_length": result["text_length"],
+        "skills": result["skills"],
+        "skills_count": result["skills_count"],
+        "contact": result["contact"],
+        "education": result["education"],
+        "name": result.get("name"),
+        "experience_years": result.get("experience_years"),
+        "detected_industry": result.get("detected_industry"),
+        "preview": result["text"][:500] + "..." if len(result["text"]) > 500 else result["text"]
+    }
+
 @router.post("/upload")
 async def upload_cv(file: UploadFile = File(...)):
     """
@@ -45,38 +152,47 @@ async def upload_cv(file: UploadFile = File(...)):
     
     Returns extracted text, skills, and contact information.
     """
-    # Cleanup old CVs periodically
-    cleanup_old_cvs()
-    
     try:
         # Get filename
         filename = file.filename or "unknown"
         
         # Validate file type
-        if not any(filename.lower().endswith(ext) for ext in ['.pdf', '.docx', '.txt']):
+        if os.path.splitext(filename)[1].lower() not in _ALLOWED_EXTS:
             raise HTTPException(
                 status_code=400,
                 detail="Unsupported file format. Please upload PDF, DOCX, or TXT."
             )
         
-        # Read file content
-        content = await file.read()
+        # Stream file content in chunks, hashing as we go and rejecting
+        # oversized uploads before they are fully buffered
+        buf = bytearray()
+        hasher = blake3.blake3()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            buf.extend(chunk)
+            hasher.update(chunk)
+            if len(buf) > MAX_UPLOAD_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail="File too large. Maximum size is 10MB."
+                )
         
         # Check if we got any content
-        if not content or len(content) == 0:
+        if not buf:
             raise HTTPException(
                 status_code=400,
                 detail="Empty file received. Please upload a valid file."
             )
         
-        if len(content) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(
-                status_code=400,
-                detail="File too large. Maximum size is 10MB."
-            )
+        # Generate a simple ID for the CV (12 hex chars)
+        cv_id = hasher.hexdigest(6)
         
-        # Analyze the CV
-        result = cv_parser.analyze_cv(content, filename)
+        # The same bytes were parsed recently (retry, second tab): reuse the stored result
+        result = await cv_store.get(cv_id)
+        if result is None:
+            # Concurrent uploads of the same file share a single parse
+            result = await _single_flight(
+                upload_inflight, cv_id, lambda: _parse_and_store(cv_id, bytes(buf), filename)
+            )
         
         if not result["success"]:
             raise HTTPException(
@@ -84,30 +200,7 @@ async def upload_cv(file: UploadFile = File(...)):
                 detail=result.get("error", "Failed to parse CV")
             )
         
-        # Generate a simple ID for the CV
-        cv_id = hashlib.md5(content).hexdigest()[:12]
-        
-        # Store for later use with timestamp
-        result["timestamp"] = time.time()
-        cv_store[cv_id] = result
-        
-        logger.info(f"CV uploaded successfully: {cv_id} ({result['skills_count']} skills detected)")
-        
-        return {
-            "success": True,
-            "cv_id": cv_id,
-            "filename": result["filename"],
-            "format": result["format"],
-            "text_length": result["text_length"],
-            "skills": result["skills"],
-            "skills_count": result["skills_count"],
-            "contact": result["contact"],
-            "education": result["education"],
-            "name": result.get("name"),
-            "experience_years": result.get("experience_years"),
-            "detected_industry": result.get("detected_industry"),
-            "preview": result["text"][:500] + "..." if len(result["text"]) > 500 else result["text"]
-        }
+        return _upload_response(cv_id, result, filename)
     except HTTPException:
         raise
     except Exception as e:
@@ -120,10 +213,7 @@ async def upload_cv(file: UploadFile = File(...)):
 @router.get("/{cv_id}")
 async def get_cv(cv_id: str):
     """Get stored CV data by ID"""
-    if cv_id not in cv_store:
-        raise HTTPException(status_code=404, detail="CV not found or expired. Please upload again.")
-    
-    cv_data = cv_store[cv_id]
+    cv_data = await get_stored_cv(cv_id)
     return {
         "success": True,
         "cv_id": cv_id,
@@ -147,24 +237,12 @@ async def generate_tailored_cv(request: CVGenerateRequest):
     Uses AI to rewrite and optimize the CV based on the job description.
     Returns the tailored CV content.
     """
-    if request.cv_id not in cv_store:
-        raise HTTPException(status_code=404, detail="CV not found or expired. Please upload again.")
-    
-    cv_data = cv_store[request.cv_id]
+    cv_data = await get_stored_cv(request.cv_id)
     
     logger.info(f"Generating tailored CV for {request.job_title} at {request.company_name}")
     
     # Generate tailored CV (JSON)
-    result = ai_service.generate_tailored_cv_json(
-        cv_text=cv_data["text"],
-        cv_skills=cv_data["skills"],
-        job_title=request.job_title,
-        job_description=request.job_description,
-        company_name=request.company_name,
-        ats_analysis_json=request.ats_analysis,
-        contact_info=cv_data.get("contact"),
-        candidate_name=cv_data.get("name")
-    )
+    result = await get_tailored_cv_json(request, cv_data)
     
     if not result["success"]:
         logger.error(f"CV generation failed: {result.get('error')}")
@@ -191,35 +269,23 @@ async def generate_cv_pdf(request: CVGenerateRequest):
     Generate a tailored CV as a downloadable PDF using direct JSON->PDF generation
     This is faster and more reliable than LaTeX compilation.
     """
-    if request.cv_id not in cv_store:
-        raise HTTPException(status_code=404, detail="CV not found or expired. Please upload again.")
-    
-    cv_data = cv_store[request.cv_id]
+    cv_data = await get_stored_cv(request.cv_id)
     
     logger.info(f"Generating PDF CV (JSON method) for {request.job_title} at {request.company_name}")
     
     # Generate tailored CV content as JSON
-    result = ai_service.generate_tailored_cv_json(
-        cv_text=cv_data["text"],
-        cv_skills=cv_data["skills"],
-        job_title=request.job_title,
-        job_description=request.job_description,
-        company_name=request.company_name,
-        ats_analysis_json=request.ats_analysis,
-        contact_info=cv_data.get("contact"),
-        candidate_name=cv_data.get("name")
-    )
+    result = await get_tailored_cv_json(request, cv_data)
     
     if not result["success"]:
         logger.error(f"CV generation failed: {result.get('error')}")
         raise HTTPException(status_code=500, detail=result.get("error", "Generation failed"))
     
-    # Generate PDF directly from JSON (ReportLab)
-    pdf_bytes = pdf_generator.generate_cv_from_json(result["data"])
+    # Generate PDF directly from JSON (ReportLab); rendering is CPU-bound, so keep it off the event loop
+    pdf_bytes = await anyio.to_thread.run_sync(pdf_generator.generate_cv_from_json, result["data"])
     
     # Sanitize filename
-    safe_company = "".join(c if c.isalnum() or c in " -_" else "_" for c in request.company_name)
-    safe_title = "".join(c if c.isalnum() or c in " -_" else "_" for c in request.job_title)
+    safe_company = _UNSAFE_FILENAME_CHARS.sub("_", request.company_name)
+    safe_title = _UNSAFE_FILENAME_CHARS.sub("_", request.job_title)
     
     filename = f"CV_{safe_company}_{safe_title}.pdf".replace(" ", "_")
     logger.info(f"PDF generated successfully: {filename}")
@@ -230,7 +296,8 @@ async def generate_cv_pdf(request: CVGenerateRequest):
     skills_added = ",".join(imp_report.get("skills_added", []))
     
     headers = {
-        "Content-Disposition": f"attachment; filename={filename}",
+        "Content-Disposition": f"attachment; filename=\"{filename}\"; filename*=UTF-8''{quote(filename)}",
+        "Content-Encoding": "identity",  # PDF streams are already compressed; tells GZipMiddleware to skip it
         "Access-Control-Expose-Headers": "X-New-Score, X-Skills-Added",  # Critical for CORS
         "X-New-Score": str(new_score),
         "X-Skills-Added": skills_added
@@ -253,27 +320,59 @@ async def analyze_cv_fit(request: CVGenerateRequest):
     - Matching skills
     - Advice on how to fit
     """
-    if request.cv_id not in cv_store:
-        raise HTTPException(status_code=404, detail="CV not found or expired. Please upload again.")
-    
-    cv_data = cv_store[request.cv_id]
+    cv_data = await get_stored_cv(request.cv_id)
     
     logger.info(f"Analyzing CV fit for {request.job_title} at {request.company_name}")
     
-    # Perform deep analysis
-    result = ai_service.analyze_fit(
+    # Perform deep analysis and generate the tailored CV in the same LLM call
+    result = await ai_service.analyze_and_tailor(
         cv_text=cv_data["text"],
         cv_skills=cv_data["skills"],
         job_title=request.job_title,
-        job_description=request.job_description
+        job_description=request.job_description,
+        company_name=request.company_name,
+        contact_info=cv_data.get("contact"),
+        candidate_name=cv_data.get("name")
     )
     
     if not result["success"]:
         logger.error(f"CV analysis failed: {result.get('error')}")
         raise HTTPException(status_code=500, detail=result.get("error", "Analysis failed"))
     
+    # Seed the generation cache so the follow-up Preview/Download needs no second LLM call
+    if result["tailored_cv"]["success"]:
+        generation_cache[_generation_key(request)] = result["tailored_cv"]
+    
+    return {
+        "success": True,
+        "analysis": result["analysis"]["data"],
+        "detected_industry": cv_data.get("detected_industry", "General")
+    }
+
+@router.post("/analyze/batch")
+async def analyze_cv_fit_batch(request: CVBatchAnalyzeRequest):
+    """
+    Analyze CV fit against several jobs at once
+    
+    Jobs are analyzed concurrently; each entry in "results" matches the job at the same
+    position and is either {"success": true, "analysis": ...} or {"success": false, "error": ...}
+    """
+    cv_data = await get_stored_cv(request.cv_id)
+    
+    logger.info(f"Analyzing CV fit for {len(request.jobs)} jobs")
+    
+    results = await ai_service.analyze_fit_batch(
+        cv_text=cv_data["text"],
+        cv_skills=cv_data["skills"],
+        jobs=[{"title": job.job_title, "description": job.job_description} for job in request.jobs]
+    )
+    
     return {
         "success": True,
-        "analysis": result["data"],
+        "results": [
+            {"success": True, "analysis": result["data"]} if result["success"]
+            else {"success": False, "error": result.get("error", "Analysis failed")}
+            for result in results
+        ],
         "detected_industry": cv_data.get("detected_industry", "General")
     }
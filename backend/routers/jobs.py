@@ -2,20 +2,25 @@
 Jobs Router - API endpoints for job search
 """
 from fastapi import APIRouter, Query
+from fastapi.responses import Response
 from typing import Optional
 from services.job_service import job_service
 
 router = APIRouter()
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class SearchFilters(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     fullTime: bool = False
     partTime: bool = False
     permanent: bool = False
     contract: bool = False
 
 class SearchRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     query: str
     location: Optional[str] = None
     country: str = "gb"
@@ -31,13 +36,23 @@ async def search_jobs_get(
     fullTime: Optional[bool] = Query(None),
     partTime: Optional[bool] = Query(None),
     permanent: Optional[bool] = Query(None),
-    contract: Optional[bool] = Query(None)
+    contract: Optional[bool] = Query(None),
+    raw: bool = Query(False, description="Return Reed's job objects unmodified (total in X-Total-Count)")
 ):
     """Legacy GET support for search"""
-    return await job_service.search_jobs(
+    result = await job_service.search_jobs(
         query=q, location=location, country=country, page=page, results_per_page=limit,
-        full_time=fullTime, part_time=partTime, permanent=permanent, contract=contract
+        full_time=fullTime, part_time=partTime, permanent=permanent, contract=contract,
+        normalize=not raw
     )
+    if raw and result["success"]:
+        # Already serialized by the service; skip response-model encoding entirely
+        return Response(
+            content=result["raw_bytes"],
+            media_type="application/json",
+            headers={"X-Total-Count": str(result["count"])}
+        )
+    return result
 
 @router.post("/search")
 async def search_jobs(request: SearchRequest):
@@ -1,12 +1,26 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 from services import review_service
+from functools import partial
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+import anyio
+import hmac
 import os
 
 router = APIRouter()
 
+# Rate limiter for admin endpoints (registered on the app in main.py). Keyed on request.client,
+# which the proxy-header middleware only rewrites for proxies listed in FORWARDED_ALLOW_IPS
+limiter = Limiter(key_func=get_remote_address)
+
+# Read once at import; compared in constant time on delete
+_ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "").encode()
+
 class ReviewCreate(BaseModel):
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
     name: str = Field(..., min_length=2, max_length=50)
     rating: int = Field(..., ge=1, le=5)
     comment: str = Field(..., min_length=5, max_length=500)
@@ -21,11 +35,11 @@ class ReviewResponse(BaseModel):
 class DeleteRequest(BaseModel):
     password: str
 
-@router.get("/", response_model=List[ReviewResponse])
+@router.get("/", responses={200: {"model": List[ReviewResponse]}})
 async def get_reviews():
-    """Get all user reviews."""
+    """Get all user reviews (stored dicts are returned as-is, without per-item re-validation)."""
     try:
-        return review_service.get_all_reviews()
+        return await anyio.to_thread.run_sync(review_service.get_all_reviews)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -33,24 +47,24 @@ async def get_reviews():
 async def submit_review(review: ReviewCreate):
     """Submit a new review."""
     try:
-        return review_service.add_review(
+        return await anyio.to_thread.run_sync(partial(
+            review_service.add_review,
             name=review.name,
             rating=review.rating,
             comment=review.comment
-        )
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{review_id}")
-async def delete_review(review_id: str, request: DeleteRequest):
+@limiter.limit("5/minute")
+async def delete_review(review_id: str, body: DeleteRequest, request: Request):
     """Delete a review (Admin only - password validated on backend)."""
-    admin_password = os.getenv("ADMIN_PASSWORD")
-    
-    if not admin_password or request.password != admin_password:
+    if not _ADMIN_PASSWORD or not hmac.compare_digest(body.password.encode(), _ADMIN_PASSWORD):
         raise HTTPException(status_code=401, detail="Password incorrect")
     
     try:
-        success = review_service.delete_review(review_id)
+        success = await anyio.to_thread.run_sync(review_service.delete_review, review_id)
         if not success:
             raise HTTPException(status_code=404, detail="Review not found")
         return {"status": "success", "message": "Review deleted"}
@@ -3,146 +3,89 @@ AI Service - LLM Integration for CV Tailoring
 Uses Azure AI Inference SDK with GitHub Models
 """
 import os
-import json
-from typing import Dict, Any, Optional
-from azure.ai.inference import ChatCompletionsClient
-from azure.ai.inference.models import SystemMessage, UserMessage
+import re
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Dict, Any, Final, List, Optional
+from azure.ai.inference.aio import ChatCompletionsClient
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.core.rest import HttpRequest
+import aiohttp
+import blake3
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
 
-class AIService:
-    """Service for AI-powered CV tailoring"""
-    
-    def __init__(self):
-        self.token = os.getenv("GITHUB_TOKEN", "")
-        self.endpoint = "https://models.inference.ai.azure.com"
-        # Priority list: Try best model first, then fallback
-        self.models = ["gpt-4o", "gpt-4o-mini"]
-        
-        if not self.token:
-            logger.warning("⚠️ GITHUB_TOKEN not found. AI features will be unavailable.")
-            self.client = None
-        else:
-            # Disable automatic retries - we handle fallback ourselves
-            self.client = ChatCompletionsClient(
-                endpoint=self.endpoint,
-                credential=AzureKeyCredential(self.token),
-                retry_total=0  # Don't wait on rate limits, fail fast
-            )
-    
-    def _call_llm(self, system_prompt: str, user_prompt: str, json_mode: bool = False) -> Dict[str, Any]:
-        """
-        Make a call to the LLM with automatic fallback support
-        """
-        if not self.client:
-            return {
-                "success": False,
-                "error": "AI service not configured. Set GITHUB_TOKEN environment variable."
-            }
-        
-        # Prepare the prompt once
-        full_user_prompt = user_prompt
-        if json_mode:
-            full_user_prompt += "\n\nIMPORTANT: Output ONLY valid JSON."
-            
-        last_error = None
-        
-        # Try models in order
-        for model in self.models:
-            logger.info(f"🤖 Attempting AI call with model: {model}...")
-            try:
-                response = self.client.complete(
-                    messages=[
-                        SystemMessage(content=system_prompt),
-                        UserMessage(content=full_user_prompt)
-                    ],
-                    model=model,
-                    temperature=0.7,
-                    max_tokens=4000,
-                    timeout=10  # Fail fast (10s)
-                )
-                
-                content = response.choices[0].message.content
-                logger.info(f"✅ Success with {model}")
-                
-                # Parse JSON if requested
-                if json_mode:
-                    try:
-                        # Robust JSON extraction
-                        clean_content = content.strip()
-                        
-                        # specific fix for markdown code blocks
-                        if "```json" in clean_content:
-                            clean_content = clean_content.split("```json")[1].split("```")[0].strip()
-                        elif "```" in clean_content:
-                            clean_content = clean_content.split("```")[1].split("```")[0].strip()
-                        
-                        # If deeper cleanup is needed (finding first { and last })
-                        start_idx = clean_content.find('{')
-                        end_idx = clean_content.rfind('}')
-                        
-                        if start_idx != -1 and end_idx != -1:
-                            clean_content = clean_content[start_idx:end_idx+1]
-                            
-                        parsed_content = json.loads(clean_content)
-                        return {
-                            "success": True,
-                            "data": parsed_content
-                        }
-                    except json.JSONDecodeError:
-                        logger.error(f"❌ JSON Parse Error with {model}")
-                        return {
-                            "success": False,
-                            "error": "Failed to parse AI response as JSON",
-                            "raw_content": content
-                        }
-                
-                # Success (Text mode)
-                return {
-                    "success": True,
-                    "content": content,
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens,
-                        "completion_tokens": response.usage.completion_tokens
-                    }
-                }
+# Connection pool for the inference endpoint, shared by every LLM call in the process
+LLM_MAX_CONNECTIONS = 64
+LLM_KEEPALIVE_SECONDS = 60  # aiohttp default is 15s; keep warm connections around between user requests
 
-            except Exception as e:
-                last_error = str(e)
-                logger.warning(f"⚠️ AI Error with {model}: {last_error}")
-                
-                # Auth error - Stop immediately
-                if "401" in last_error or "unauthorized" in last_error.lower():
-                    return {
-                        "success": False,
-                        "error": "Invalid API token. Please check your GITHUB_TOKEN."
-                    }
-                
-                # Rate limit or timeout - Continue to next model
-                continue
-
-        # If we get here, all models failed
-        logger.error("❌ All models failed.")
-        return {
-            "success": False,
-            "error": "Server is busy due to high demand. Please help keep the servers running: https://buymeacoffee.com/manojthapa",
-            "details": last_error
-        }
-    
-    def analyze_fit(
-        self,
-        cv_text: str,
-        cv_skills: list,
-        job_title: str,
-        job_description: str
-    ) -> Dict[str, Any]:
-        """
-        Perform deep analysis of CV fit for a job
-        Returns score, missing skills, and advice
-        """
-        system_prompt = """You are an expert ATS (Applicant Tracking System) scoring engine and technical recruiter. Your task is to calculate a match score between a CV and a job description while checking domain/background compatibility.
+# If the current model hasn't answered within this many seconds, start the next one in parallel
+# and take whichever finishes first (0 races every model at once). Short calls (the analysis alone)
+# and long calls (a tailored CV, alone or with the analysis) take very different times to decode,
+# so each gets its own delay; a single one would either hedge healthy long calls or never hedge short ones
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv("AI_HEDGE_DELAY_S", "10"))
+LLM_LONG_HEDGE_DELAY_SECONDS = float(os.getenv("AI_LONG_HEDGE_DELAY_S", "45"))
+
+# Overall budget for one LLM request across all models; anything still running after this is cancelled
+LLM_TOTAL_TIMEOUT_SECONDS = float(os.getenv("AI_TOTAL_TIMEOUT_S", "90"))
+
+# Per-attempt socket limits: fail fast if the endpoint can't be reached at all, but give a
+# healthy completion (no bytes arrive until it is fully decoded) the whole request budget
+LLM_CONNECT_TIMEOUT_SECONDS = 10
+LLM_READ_TIMEOUT_SECONDS = LLM_TOTAL_TIMEOUT_SECONDS
+
+# Maximum analyses in flight at once for batch requests (keeps us under provider rate limits)
+LLM_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "5"))
+
+# Circuit breaker: after this many consecutive failures a model is skipped for the cooldown window
+LLM_BREAKER_THRESHOLD = 5
+LLM_BREAKER_COOLDOWN_SECONDS = 30
+
+# On a 429, wait out a Retry-After this short and retry the same model once;
+# a longer one opens that model's circuit until the rate-limit window resets
+LLM_MAX_RETRY_AFTER_SECONDS = 2.0
+
+# How much of the CV and job description each prompt includes
+ANALYZE_CV_CHARS = 3000
+ANALYZE_JOB_CHARS = 4000
+TAILOR_CV_CHARS = 6000
+TAILOR_JOB_CHARS = 3000
+
+# Completion budgets (max_tokens) per call type. The combined call has to fit a full analysis and a
+# full tailored CV in one response, so it gets both standalone budgets plus headroom for the wrapper
+ANALYZE_MAX_TOKENS = 1500
+TAILOR_MAX_TOKENS = 3000
+COMBINED_MAX_TOKENS = ANALYZE_MAX_TOKENS + TAILOR_MAX_TOKENS + 1000
+
+# Cheap local "is this a CV?" check, run before spending an LLM call on the document
+_CV_TERMS_PATTERN = re.compile(
+    r"\b(experience|education|skills?|projects?|university|college|employment|work history|"
+    r"qualifications?|certifications?|degree|internships?|responsibilities|references|linkedin)\b|@",
+    re.IGNORECASE
+)
+CV_MIN_CHARS = 300
+CV_MIN_DISTINCT_TERMS = 3
+
+_NOT_A_CV_ERROR = "The provided document does not appear to be a CV or Resume. Please upload a valid CV or Resume."
+
+# Fallback JSON extraction for responses that arrive wrapped in markdown fences or prose
+_JSON_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+# ATS analysis fields that carry no information for the tailoring prompt
+_ATS_PROMPT_EXCLUDED_KEYS = frozenset({"score_guide", "raw_content"})
+
+# Successful responses are memoized per exact prompt (re-analyzing the same CV against the same job)
+LLM_CACHE_MAX_SIZE = 256
+
+# System prompts and JSON output formats, shared by the standalone and combined calls
+_ANALYZE_SYSTEM_PROMPT: Final[str] = """You are an expert ATS (Applicant Tracking System) scoring engine and technical recruiter. Your task is to calculate a match score between a CV and a job description while checking domain/background compatibility.
 
 ═══════════════════════════════════════════════════════════
 STEP 0: CONTENT VALIDATION (CRITICAL FIRST STEP)
@@ -328,52 +271,42 @@ PROJECT RECOMMENDATION RULES:
    - "Include metrics for your AWS experience"
 """
 
-        user_prompt = f"""Analyze this candidate for the role of {job_title}.
-
-INPUTS PROVIDED:
-1. Candidate CV Content:
-Skills: {', '.join(cv_skills)}
-Experience Snippet: {cv_text[:3000]}
-
-2. Job Description:
-{job_description[:4000]}
-
-═══════════════════════════════════════════════════════════
+_ANALYZE_OUTPUT_FORMAT: Final[str] = """═══════════════════════════════════════════════════════════
 OUTPUT FORMAT (JSON)
 ═══════════════════════════════════════════════════════════
 
-{{
+{
   "is_valid_cv": true,
   "rejection_reason": null,
-  "job_analysis": {{
+  "job_analysis": {
     "job_title": "extracted role title",
     "required_experience": "e.g., 5+ years",
     "required_education": "e.g., Bachelor's in Computer Science",
-    "extracted_keywords": {{
+    "extracted_keywords": {
       "must_have": ["keyword1", "keyword2"],
       "nice_to_have": ["keyword3", "keyword4"],
       "critical_keywords": ["keyword1"]
-    }},
+    },
     "soft_skills": ["Agile", "Communication"]
-  }},
+  },
   "domain_match": "complete_mismatch | weak_match | good_match",
   "overall_ats_score": <number 0-100>,
   "score_interpretation": "Brief explanation based on score and domain match",
-  "breakdown": {{
-    "keyword_match": {{
+  "breakdown": {
+    "keyword_match": {
       "score": 0-100,
       "weight": 35,
       "weighted_score": 0,
       "matched_keywords": ["list of matched"],
       "missing_critical_keywords": ["list of critical missing"]
-    }},
-    "job_title_alignment": {{
+    },
+    "job_title_alignment": {
       "score": 0-100,
       "weight": 20,
       "weighted_score": 0,
       "details": "explanation of title match"
-    }},
-    "skills_coverage": {{
+    },
+    "skills_coverage": {
       "score": 0-100,
       "weight": 25,
       "weighted_score": 0,
@@ -381,26 +314,26 @@ OUTPUT FORMAT (JSON)
       "must_have_total": 0,
       "nice_to_have_present": 0,
       "nice_to_have_total": 0
-    }},
-    "experience_level": {{
+    },
+    "experience_level": {
       "score": 0-100,
       "weight": 10,
       "weighted_score": 0,
       "cv_experience": "extracted from CV",
       "required_experience": "extracted from job"
-    }},
-    "education_certification": {{
+    },
+    "education_certification": {
       "score": 0-100,
       "weight": 5,
       "weighted_score": 0,
       "details": "explanation"
-    }},
-    "formatting_readability": {{
+    },
+    "formatting_readability": {
       "score": 0-100,
       "weight": 5,
       "weighted_score": 0
-    }}
-  }},
+    }
+  },
   "matching_skills": ["ONLY skills that appear BOTH in the job description AND in the CV - these are the overlapping skills"],
   "missing_skills": ["Skills required by the job description that are NOT found in the CV"],
   "advice": [
@@ -414,12 +347,12 @@ OUTPUT FORMAT (JSON)
     "Do NOT recommend projects for skills already in CV"
   ],
   "summary": "1-2 sentence summary including domain match status and key takeaway",
-  "score_guide": {{
+  "score_guide": {
     "80-100": "Excellent - strong ATS pass likelihood",
     "60-79": "Moderate - optimization recommended",
     "below_60": "Low - significant tailoring needed"
-  }}
-}}
+  }
+}
 
 CRITICAL RULES:
 1. If domain_match is "complete_mismatch", summary MUST state: "Your background in [X] does not align with this [Y] role. We recommend applying for positions matching your [X] expertise."
@@ -440,38 +373,7 @@ CRITICAL RULES:
    - General: Always treat synonyms and related certifications as matching skills
 """
 
-        result = self._call_llm(system_prompt, user_prompt, json_mode=True)
-        
-        if result.get("success") and result.get("data"):
-            # Validation Check
-            if result["data"].get("is_valid_cv") is False:
-                # User requested specific static message
-                return {
-                    "success": False,
-                    "error": "The provided document does not appear to be a CV or Resume. Please upload a valid CV or Resume."
-                }
-
-        # Ensure compatibility with frontend by mapping 'overall_ats_score' to 'score'
-        if result.get("success") and result.get("data") and "overall_ats_score" in result["data"]:
-            result["data"]["score"] = result["data"]["overall_ats_score"]
-            
-        return result
-    
-    def generate_tailored_cv_json(
-        self,
-        cv_text: str,
-        cv_skills: list,
-        job_title: str,
-        job_description: str,
-        company_name: str,
-        ats_analysis_json: Dict[str, Any] = None,
-        contact_info: Dict[str, Any] = None,
-        candidate_name: str = None
-    ) -> Dict[str, Any]:
-        """
-        Generate a tailored CV in structured JSON format for direct PDF generation
-        """
-        system_prompt = """You are an expert CV optimization specialist. Your task is to create a highly optimized, ATS-friendly CV in structured JSON format for PDF generation using Python ReportLab.
+_TAILOR_SYSTEM_PROMPT: Final[str] = """You are an expert CV optimization specialist. Your task is to create a highly optimized, ATS-friendly CV in structured JSON format for PDF generation using Python ReportLab.
 
 CONTEXT: You will receive ATS scoring results that identified missing keywords, domain match status, and recommendations. Use these insights to optimize the CV.
 
@@ -535,69 +437,27 @@ OPTIMIZATION REQUIREMENTS:
    - Bullet points concise (70-180 characters)
 """
 
-        # Extract useful data from ATS analysis for the prompt
-        missing_critical = []
-        domain_match = "good_match"
-        if ats_analysis_json:
-            missing_critical = ats_analysis_json.get("breakdown", {}).get("keyword_match", {}).get("missing_critical_keywords", [])
-            domain_match = ats_analysis_json.get("domain_match", "good_match")
+_TAILOR_OUTPUT_FORMAT: Final[str] = """OUTPUT JSON STRUCTURE (STANDARD CV ORDER):
 
-        # Build explicit contact info section if provided
-        contact_section = ""
-        if contact_info or candidate_name:
-            contact_section = "\n\n4. EXTRACTED CONTACT INFORMATION (USE EXACTLY AS PROVIDED):\n"
-            if candidate_name:
-                contact_section += f"   - Name: {candidate_name}\n"
-            if contact_info:
-                if contact_info.get("email"):
-                    contact_section += f"   - Email: {contact_info['email']}\n"
-                if contact_info.get("phone"):
-                    contact_section += f"   - Phone: {contact_info['phone']}\n"
-                if contact_info.get("linkedin"):
-                    contact_section += f"   - LinkedIn: {contact_info['linkedin']}\n"
-            contact_section += "   IMPORTANT: Use the contact details above EXACTLY. Do NOT use placeholders.\n"
-
-        user_prompt = f"""INPUTS PROVIDED:
-
-1. ATS Scoring Results:
-{str(ats_analysis_json)}
-
-2. Current CV:
-{cv_text[:6000]}
-
-3. Target Job:
-{job_title} at {company_name}
-{job_description[:3000]}
-{contact_section}
-
-TASK: Using the ATS scoring results, optimize the CV to improve the score while maintaining honesty.
-
-Pay special attention to:
-- Missing critical keywords: {', '.join(missing_critical)}
-- Domain match status: {domain_match}
-- Recommendations from scoring analysis
-
-OUTPUT JSON STRUCTURE (STANDARD CV ORDER):
-
-{{
-  "header": {{
+{
+  "header": {
     "name": "Full Name",
     "email": "email@example.com",
     "phone": "+XX-XXXXXXXXXX",
     "location": "City, Country",
     "linkedin": "LinkedIn URL (only if in original CV)",
     "github": "GitHub URL (only if in original CV)"
-  }},
+  },
   "summary": "2-3 sentence summary (NO 'seeking' or 'looking for' phrases)",
   "education": [
-    {{
+    {
       "degree": "Degree Title",
       "institution": "University Name",
       "location": "City, Country",
       "dates": "Month Year - Month Year"
-    }}
+    }
   ],
-  "skills": {{
+  "skills": {
     // CHOOSE CATEGORIES BASED ON INDUSTRY. Examples:
     // Tech: "languages", "frameworks", "tools", "databases", "cloud"
     // Healthcare: "clinical_skills", "certifications", "software", "languages"
@@ -606,9 +466,9 @@ OUTPUT JSON STRUCTURE (STANDARD CV ORDER):
     
     // Use 3-5 categories that fit the CV's industry. Omit empty categories.
     "category_name": ["Skill1", "Skill2"]
-  }},
+  },
   "experience": [
-    {{
+    {
       "title": "Job Title",
       "company": "Company Name",
       "location": "City, Country",
@@ -617,30 +477,30 @@ OUTPUT JSON STRUCTURE (STANDARD CV ORDER):
         "Achievement with metrics and keywords",
         "Achievement with quantifiable impact"
       ]
-    }}
+    }
   ],
   "projects": [
-    {{
+    {
       "name": "Project Name",
       "technologies": "Tech1, Tech2",
       "dates": "Month Year",
       "description": "Description with impact and relevant technologies"
-    }}
+    }
   ],
   "certifications": [
-    {{
+    {
       "name": "Certification Name",
       "issuer": "Issuer Organization",
       "year": "Year/Date"
-    }}
+    }
   ],
-  "improvement_report": {{
+  "improvement_report": {
     "original_score": "Value from input",
     "new_score": "Estimated new score (0-100) after adding missing keywords",
     "skills_added": ["List of skills you successfully added to the CV"],
     "remaining_gaps": ["List of skills/experience you could NOT add (e.g. requires specific project experience)"]
-  }}
-}}
+  }
+}
 
 CRITICAL: HANDLING MISSING INFORMATION
 - If original CV lacks a section, COMPLETELY OMIT that key
@@ -655,12 +515,618 @@ CRITICAL: CONSISTENCY CHECK
 SCORING RULES:
 - If "missing_critical_keywords" was empty and you have optimized the phrasing/formatting, the new_score MUST be very high (95-100).
 - Only deduct points if there are genuine gaps you could not fill.
+"""
+
 
+# analyze_and_tailor: scoring instructions followed by the optimization instructions
+_COMBINED_SYSTEM_PROMPT: Final[str] = f"""{_ANALYZE_SYSTEM_PROMPT}
+═══════════════════════════════════════════════════════════
+STEP 5: OPTIMIZE THE CV
+═══════════════════════════════════════════════════════════
+
+After scoring, act as the CV optimization specialist below and use your own scoring results as the ATS analysis.
+
+{_TAILOR_SYSTEM_PROMPT}"""
+
+class PooledAioHttpTransport(AioHttpTransport):
+    """aiohttp transport with an explicitly sized keep-alive connection pool"""
+    
+    async def open(self):
+        # The session must be created inside the running event loop, so build it on first use
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=LLM_MAX_CONNECTIONS,
+                    keepalive_timeout=LLM_KEEPALIVE_SECONDS
+                ),
+                cookie_jar=aiohttp.DummyCookieJar(),
+                auto_decompress=False,
+                trust_env=True
+            )
+        await super().open()
+
+class AIService:
+    """Service for AI-powered CV tailoring"""
+    
+    def __init__(self):
+        self.token = os.getenv("GITHUB_TOKEN", "")
+        self.endpoint = "https://models.inference.ai.azure.com"
+        # Priority list: Try best model first, then fallback
+        self.models = ["gpt-4o", "gpt-4o-mini"]
+        # Per-model failure tracking for the circuit breaker
+        self._breakers = {
+            m: {"failures": 0, "opened_at": 0.0, "cooldown": LLM_BREAKER_COOLDOWN_SECONDS, "probing": False}
+            for m in self.models
+        }
+        # LRU of successful responses keyed by a digest of the prompts
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Shared by all batch requests so concurrent batches don't multiply the load
+        self._batch_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        
+        if not self.token:
+            logger.warning("⚠️ GITHUB_TOKEN not found. AI features will be unavailable.")
+    
+    @cached_property
+    def client(self) -> Optional[ChatCompletionsClient]:
+        """
+        Inference client, built on first use so processes that never call the LLM
+        (scripts, tooling) don't construct one at import
+        """
+        if not self.token:
+            return None
+        # Disable automatic retries - we handle fallback ourselves
+        return ChatCompletionsClient(
+            endpoint=self.endpoint,
+            credential=AzureKeyCredential(self.token),
+            transport=PooledAioHttpTransport(),
+            retry_total=0  # Don't wait on rate limits, fail fast
+        )
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP session (called on application shutdown)"""
+        # Don't build a client just to close it
+        client = self.__dict__.pop("client", None)
+        if client:
+            await client.close()
+    
+    async def warmup(self) -> None:
+        """
+        Open a connection to the inference endpoint ahead of the first user request
+        so the TLS handshake is already paid for and the connection sits in the pool
+        """
+        if not self.client:
+            return
+        try:
+            response = await self.client.send_request(HttpRequest("HEAD", self.endpoint), timeout=10)
+            logger.info("🔥 AI endpoint connection warmed (HTTP %s)", response.status_code)
+        except Exception as e:
+            # Not fatal - the first real call will simply connect on its own
+            logger.warning("⚠️ AI endpoint warm-up failed: %s", e)
+    
+    def _can_call(self, model: str) -> bool:
+        """
+        False while the model's circuit is open (too many recent consecutive failures).
+        Once the cooldown has passed the circuit is half-open: the first caller is let through
+        as the probe, and everyone else is still turned away until the probe's result is recorded
+        """
+        breaker = self._breakers[model]
+        if breaker["failures"] < LLM_BREAKER_THRESHOLD:
+            return True
+        if breaker["probing"] or time.monotonic() - breaker["opened_at"] < breaker["cooldown"]:
+            return False
+        breaker["probing"] = True
+        return True
+    
+    def _record_result(self, model: str, success: bool) -> None:
+        """Update the model's circuit breaker after a call (a success closes it, a failure re-arms the cooldown)"""
+        breaker = self._breakers[model]
+        breaker["probing"] = False
+        if success:
+            breaker["failures"] = 0
+        else:
+            breaker["failures"] += 1
+            breaker["opened_at"] = time.monotonic()
+        breaker["cooldown"] = LLM_BREAKER_COOLDOWN_SECONDS
+    
+    def _open_circuit(self, model: str, seconds: float) -> None:
+        """Skip the model entirely for the given number of seconds (e.g. a long Retry-After)"""
+        breaker = self._breakers[model]
+        breaker["failures"] = max(breaker["failures"], LLM_BREAKER_THRESHOLD)
+        breaker["opened_at"] = time.monotonic()
+        breaker["cooldown"] = seconds
+        breaker["probing"] = False
+    
+    @staticmethod
+    def _parse_json_content(content: str) -> Any:
+        """
+        Parse a JSON-mode response; JSON mode normally returns a bare object, but if the
+        object comes wrapped in a code fence or prose, extract it in one pass and retry
+        """
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            match = _JSON_FENCE_PATTERN.search(content)
+            if match:
+                return orjson.loads(match.group(1))
+            return orjson.loads(content[content.find('{'):content.rfind('}') + 1])
+    
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Seconds the provider asked us to wait before retrying, if this was a 429 that said so"""
+        if not isinstance(error, HttpResponseError) or error.status_code != 429 or error.response is None:
+            return None
+        headers = error.response.headers
+        try:
+            for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+                if headers.get(name):
+                    return float(headers[name]) / 1000
+            if headers.get("Retry-After"):
+                return float(headers["Retry-After"])
+        except ValueError:
+            pass  # HTTP-date form; treat as unknown
+        return None
+    
+    async def _acomplete(self, model: str, messages: list, json_mode: bool, temperature: float, max_tokens: int):
+        """Single chat completion request against one model, retrying once after a short Retry-After"""
+        logger.info("🤖 Attempting AI call with model: %s...", model)
+        for attempt in range(2):
+            try:
+                return await self.client.complete(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    # Provider-enforced JSON output: no markdown fences or prose around the object
+                    response_format="json_object" if json_mode else None,
+                    connection_timeout=LLM_CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=LLM_READ_TIMEOUT_SECONDS
+                )
+            except HttpResponseError as e:
+                retry_after = self._retry_after(e)
+                if attempt or retry_after is None or retry_after > LLM_MAX_RETRY_AFTER_SECONDS:
+                    raise
+                logger.info("⏳ %s rate limited, retrying in %.1fs", model, retry_after)
+                await asyncio.sleep(retry_after)
+    
+    async def _acall_llm(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        temperature: float = 0.0,
+        max_tokens: int = 1200,
+        hedge_delay: float = LLM_HEDGE_DELAY_SECONDS
+    ) -> Dict[str, Any]:
+        """
+        Make a call to the LLM with automatic fallback support
+        """
+        if not self.client:
+            return {
+                "success": False,
+                "error": "AI service not configured. Set GITHUB_TOKEN environment variable."
+            }
+        
+        cache_key = blake3.blake3(
+            f"{system_prompt}\0{user_prompt}\0{json_mode}\0{temperature}\0{max_tokens}".encode()
+        ).hexdigest(16)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            logger.info("♻️ Reusing cached AI response")
+            # Callers post-process the result in place, so never hand out the cached object
+            return copy.deepcopy(cached)
+        
+        # Plain dicts are sent as-is; the SDK's message models would just be serialized back to these
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+            
+        last_error = None
+        response = None
+        model = None
+        
+        # Start models in priority order: the next one is launched as soon as the current one
+        # fails, or as a hedge if it is still running after hedge_delay seconds
+        remaining = iter(self.models)
+        running = {}
+        probes = set()  # Models whose half-open probe this call is making
+        
+        def start_next_model() -> None:
+            nonlocal last_error
+            for next_model in remaining:
+                if self._can_call(next_model):
+                    if self._breakers[next_model]["probing"]:
+                        probes.add(next_model)
+                    running[asyncio.create_task(self._acomplete(next_model, messages, json_mode, temperature, max_tokens))] = next_model
+                    return
+                last_error = f"{next_model} temporarily disabled after repeated failures"
+                logger.warning("⚡ Skipping %s: circuit open", next_model)
+        
+        start_next_model()
+        try:
+            async with asyncio.timeout(LLM_TOTAL_TIMEOUT_SECONDS):
+                while running and response is None:
+                    done, _ = await asyncio.wait(
+                        running, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    
+                    for task in done:
+                        finished_model = running.pop(task)
+                        try:
+                            result = task.result()
+                        except Exception as e:
+                            last_error = str(e)
+                            logger.warning("⚠️ AI Error with %s: %s", finished_model, last_error)
+                            retry_after = self._retry_after(e)
+                            if retry_after is not None and retry_after > LLM_MAX_RETRY_AFTER_SECONDS:
+                                # Rate-limited for a while: leave this model alone until the window resets
+                                self._open_circuit(finished_model, retry_after)
+                            else:
+                                self._record_result(finished_model, success=False)
+                            
+                            # Auth error - Stop immediately
+                            if "401" in last_error or "unauthorized" in last_error.lower():
+                                return {
+                                    "success": False,
+                                    "error": "Invalid API token. Please check your GITHUB_TOKEN."
+                                }
+                            
+                            # Rate limit or timeout - Continue to next model
+                            continue
+                        
+                        self._record_result(finished_model, success=True)
+                        if response is None:
+                            response, model = result, finished_model
+                    
+                    if response is None:
+                        start_next_model()
+        except TimeoutError:
+            last_error = f"No model responded within {LLM_TOTAL_TIMEOUT_SECONDS:g}s"
+            logger.warning("⏱️ %s", last_error)
+        finally:
+            # First success wins - drop any model still in flight
+            for task, running_model in running.items():
+                task.cancel()
+                if running_model in probes:
+                    # A cancelled probe says nothing about the model; let the next caller probe instead
+                    self._breakers[running_model]["probing"] = False
+        
+        if response is None:
+            # If we get here, all models failed
+            logger.error("❌ All models failed.")
+            return {
+                "success": False,
+                "error": "Server is busy due to high demand. Please help keep the servers running: https://buymeacoffee.com/manojthapa",
+                "details": last_error
+            }
+        
+        choice = response.choices[0]
+        content = choice.message.content
+        logger.info("✅ Success with %s", model)
+        
+        # Parse JSON if requested
+        if json_mode:
+            if choice.finish_reason == "length":
+                # Hit max_tokens: the object is cut off, even if the fallback extraction could salvage part of it
+                logger.error("❌ AI response from %s truncated at %d tokens", model, max_tokens)
+                return {
+                    "success": False,
+                    "error": "AI response was cut off before it was complete",
+                    "malformed": True,
+                    "raw_content": content
+                }
+            try:
+                parsed_content = self._parse_json_content(content)
+                result = {
+                    "success": True,
+                    "data": parsed_content
+                }
+            except orjson.JSONDecodeError:
+                logger.error("❌ JSON Parse Error with %s", model)
+                return {
+                    "success": False,
+                    "error": "Failed to parse AI response as JSON",
+                    "malformed": True,
+                    "raw_content": content
+                }
+        else:
+            # Success (Text mode)
+            result = {
+                "success": True,
+                "content": content,
+                "usage": {
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens
+                }
+            }
+        
+        self._cache[cache_key] = copy.deepcopy(result)
+        if len(self._cache) > LLM_CACHE_MAX_SIZE:
+            self._cache.popitem(last=False)
+        return result
+    
+    async def analyze_fit(
+        self,
+        cv_text: str,
+        cv_skills: list,
+        job_title: str,
+        job_description: str
+    ) -> Dict[str, Any]:
+        """
+        Perform deep analysis of CV fit for a job
+        Returns score, missing skills, and advice
+        """
+        if not self._looks_like_cv(cv_text):
+            return {"success": False, "error": _NOT_A_CV_ERROR}
+        
+        system_prompt = _ANALYZE_SYSTEM_PROMPT
+        
+        # Trim the inputs once up front
+        cv_snippet = cv_text[:ANALYZE_CV_CHARS]
+        job_snippet = job_description[:ANALYZE_JOB_CHARS]
+
+        user_prompt = f"""Analyze this candidate for the role of {job_title}.
+
+INPUTS PROVIDED:
+1. Candidate CV Content:
+Skills: {', '.join(cv_skills)}
+Experience Snippet: {cv_snippet}
+
+2. Job Description:
+{job_snippet}
+
+{_ANALYZE_OUTPUT_FORMAT}"""
+
+        # Scoring should be repeatable, and the analysis JSON is well under ANALYZE_MAX_TOKENS
+        result = await self._acall_llm(
+            system_prompt, user_prompt, json_mode=True, temperature=0.0, max_tokens=ANALYZE_MAX_TOKENS
+        )
+        return self._finish_analysis(result)
+    
+    async def analyze_fit_batch(
+        self,
+        cv_text: str,
+        cv_skills: list,
+        jobs: List[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze one CV against several jobs concurrently
+        jobs: [{"title": ..., "description": ...}]; results are returned in the same order
+        """
+        async def analyze_one(job: Dict[str, str]) -> Dict[str, Any]:
+            async with self._batch_semaphore:
+                return await self.analyze_fit(cv_text, cv_skills, job["title"], job["description"])
+        
+        results = await asyncio.gather(*(analyze_one(job) for job in jobs), return_exceptions=True)
+        return [
+            {"success": False, "error": f"Analysis failed: {result}"} if isinstance(result, Exception) else result
+            for result in results
+        ]
+    
+    async def generate_tailored_cv_json(
+        self,
+        cv_text: str,
+        cv_skills: list,
+        job_title: str,
+        job_description: str,
+        company_name: str,
+        ats_analysis_json: Dict[str, Any] = None,
+        contact_info: Dict[str, Any] = None,
+        candidate_name: str = None
+    ) -> Dict[str, Any]:
+        """
+        Generate a tailored CV in structured JSON format for direct PDF generation
+        """
+        system_prompt = _TAILOR_SYSTEM_PROMPT
+        
+        # Trim the inputs once up front
+        cv_snippet = cv_text[:TAILOR_CV_CHARS]
+        job_snippet = job_description[:TAILOR_JOB_CHARS]
+
+        # Extract useful data from ATS analysis for the prompt
+        missing_critical = []
+        domain_match = "good_match"
+        ats_prompt_json = "null"
+        if ats_analysis_json:
+            missing_critical = ats_analysis_json.get("breakdown", {}).get("keyword_match", {}).get("missing_critical_keywords", [])
+            domain_match = ats_analysis_json.get("domain_match", "good_match")
+            # Compact, valid JSON (not a Python repr) keeps the prompt short and unambiguous
+            ats_prompt_json = orjson.dumps({
+                k: v for k, v in ats_analysis_json.items() if k not in _ATS_PROMPT_EXCLUDED_KEYS
+            }).decode()
+
+        # Build explicit contact info section if provided
+        contact_section = self._contact_section(contact_info, candidate_name)
+
+        user_prompt = f"""INPUTS PROVIDED:
+
+1. ATS Scoring Results:
+{ats_prompt_json}
+
+2. Current CV:
+{cv_snippet}
+
+3. Target Job:
+{job_title} at {company_name}
+{job_snippet}
+{contact_section}
+
+TASK: Using the ATS scoring results, optimize the CV to improve the score while maintaining honesty.
+
+Pay special attention to:
+- Missing critical keywords: {', '.join(missing_critical)}
+- Domain match status: {domain_match}
+- Recommendations from scoring analysis
+
+{_TAILOR_OUTPUT_FORMAT}
 Begin optimization now."""
 
-        result = self._call_llm(system_prompt, user_prompt, json_mode=True)
+        # A little variation helps the rewritten bullets read naturally
+        result = await self._acall_llm(
+            system_prompt, user_prompt, json_mode=True, temperature=0.2, max_tokens=TAILOR_MAX_TOKENS,
+            hedge_delay=LLM_LONG_HEDGE_DELAY_SECONDS
+        )
+        return self._finish_tailored_cv(result, ats_analysis_json)
+    
+    async def analyze_and_tailor(
+        self,
+        cv_text: str,
+        cv_skills: list,
+        job_title: str,
+        job_description: str,
+        company_name: str,
+        contact_info: Dict[str, Any] = None,
+        candidate_name: str = None
+    ) -> Dict[str, Any]:
+        """
+        Score the CV and generate the tailored CV in a single LLM call
+        Returns {"success", "analysis", "tailored_cv"} where the last two have the same
+        shape as the results of analyze_fit and generate_tailored_cv_json
+        
+        If the combined response is truncated or unusable, the score comes from a standalone
+        analyze_fit call instead and tailoring is left to generate_tailored_cv_json on demand
+        """
+        if not self._looks_like_cv(cv_text):
+            return {"success": False, "error": _NOT_A_CV_ERROR}
+        
+        system_prompt = _COMBINED_SYSTEM_PROMPT
+        
+        # One prompt serves both tasks, so include the larger of the two input limits
+        cv_snippet = cv_text[:max(ANALYZE_CV_CHARS, TAILOR_CV_CHARS)]
+        job_snippet = job_description[:max(ANALYZE_JOB_CHARS, TAILOR_JOB_CHARS)]
+
+        contact_section = self._contact_section(contact_info, candidate_name)
+
+        user_prompt = f"""Analyze this candidate for the role of {job_title} at {company_name}, then optimize their CV for it.
+
+INPUTS PROVIDED:
+1. Candidate CV Content:
+Skills: {', '.join(cv_skills)}
+Current CV: {cv_snippet}
+
+2. Job Description:
+{job_snippet}
+{contact_section}
+
+TASK:
+Part 1 - Score the CV against the job (Steps 0-4). Put the result under the top-level key "ats".
+Part 2 - Using the Part 1 results, optimize the CV to improve the score while maintaining honesty.
+Pay special attention to the missing critical keywords, the domain match status and your recommendations.
+Put the result under the top-level key "tailored_cv".
+
+Respond with ONE JSON object: {{"ats": {{...}}, "tailored_cv": {{...}}}}
+If the document is not a valid CV, return only {{"ats": {{"is_valid_cv": false, "rejection_reason": "..."}}}}.
+
+"ats" FORMAT:
+
+{_ANALYZE_OUTPUT_FORMAT}
+"tailored_cv" FORMAT:
+
+{_TAILOR_OUTPUT_FORMAT}
+Begin now."""
+
+        # Room for both outputs (analysis + tailored CV); a response that still hits the limit falls back below
+        result = await self._acall_llm(
+            system_prompt, user_prompt, json_mode=True, temperature=0.2, max_tokens=COMBINED_MAX_TOKENS,
+            hedge_delay=LLM_LONG_HEDGE_DELAY_SECONDS
+        )
+        if not result.get("success"):
+            if not result.get("malformed"):
+                return result  # Every model failed or auth error: a second call would fail the same way
+            return await self._analyze_without_tailoring(cv_text, cv_skills, job_title, job_description)
+        
+        data = result["data"]
+        ats = data.get("ats") if isinstance(data, dict) else None
+        if not isinstance(ats, dict):
+            logger.error("❌ Combined AI response is missing the ATS analysis")
+            return await self._analyze_without_tailoring(cv_text, cv_skills, job_title, job_description)
         
-        # Ensure compatibility with frontend
+        analysis = self._finish_analysis({"success": True, "data": ats})
+        if not analysis["success"]:
+            return analysis
+        
+        tailored_cv = data.get("tailored_cv")
+        if isinstance(tailored_cv, dict) and tailored_cv:
+            tailored = self._finish_tailored_cv({"success": True, "data": tailored_cv}, ats)
+        else:
+            # Analysis is still usable; the CV will be generated on demand instead
+            tailored = {"success": False, "error": "Tailored CV missing from AI response"}
+        
+        return {
+            "success": True,
+            "analysis": analysis,
+            "tailored_cv": tailored
+        }
+    
+    async def _analyze_without_tailoring(
+        self,
+        cv_text: str,
+        cv_skills: list,
+        job_title: str,
+        job_description: str
+    ) -> Dict[str, Any]:
+        """Fallback for analyze_and_tailor: score with analyze_fit and leave the tailored CV for later"""
+        logger.warning("↩️ Combined AI response unusable, falling back to a standalone analysis")
+        analysis = await self.analyze_fit(cv_text, cv_skills, job_title, job_description)
+        if not analysis.get("success"):
+            return analysis
+        return {
+            "success": True,
+            "analysis": analysis,
+            "tailored_cv": {"success": False, "error": "Tailored CV will be generated on demand"}
+        }
+    
+    @staticmethod
+    def _contact_section(contact_info: Optional[Dict[str, Any]], candidate_name: Optional[str]) -> str:
+        """Prompt section listing the contact details extracted from the CV"""
+        contact_section = ""
+        if contact_info or candidate_name:
+            contact_section = "\n\n4. EXTRACTED CONTACT INFORMATION (USE EXACTLY AS PROVIDED):\n"
+            if candidate_name:
+                contact_section += f"   - Name: {candidate_name}\n"
+            if contact_info:
+                if contact_info.get("email"):
+                    contact_section += f"   - Email: {contact_info['email']}\n"
+                if contact_info.get("phone"):
+                    contact_section += f"   - Phone: {contact_info['phone']}\n"
+                if contact_info.get("linkedin"):
+                    contact_section += f"   - LinkedIn: {contact_info['linkedin']}\n"
+            contact_section += "   IMPORTANT: Use the contact details above EXACTLY. Do NOT use placeholders.\n"
+        return contact_section
+    
+    @staticmethod
+    def _looks_like_cv(text: str) -> bool:
+        """
+        Heuristic pre-check: long enough and mentions at least a few typical CV sections/terms
+        Only rejects obvious non-CVs; borderline documents are still judged by the LLM
+        """
+        if len(text) < CV_MIN_CHARS:
+            return False
+        terms = {match.group(0).lower().rstrip("s") for match in _CV_TERMS_PATTERN.finditer(text)}
+        return len(terms) >= CV_MIN_DISTINCT_TERMS
+    
+    @staticmethod
+    def _finish_analysis(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Post-process an ATS analysis result for the frontend"""
+        if result.get("success") and result.get("data"):
+            # Validation Check
+            if result["data"].get("is_valid_cv") is False:
+                # User requested specific static message
+                return {
+                    "success": False,
+                    "error": _NOT_A_CV_ERROR
+                }
+
+        # Ensure compatibility with frontend by mapping 'overall_ats_score' to 'score'
+        if result.get("success") and result.get("data") and "overall_ats_score" in result["data"]:
+            result["data"]["score"] = result["data"]["overall_ats_score"]
+            
+        return result
+    
+    @staticmethod
+    def _finish_tailored_cv(result: Dict[str, Any], ats_analysis_json: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Post-process a tailored CV result for the frontend"""
         if result.get("success") and result.get("data") and ats_analysis_json:
              # Inject the gap analysis summary for legacy frontend support
              old_score = ats_analysis_json.get('overall_ats_score', 0)
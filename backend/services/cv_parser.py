@@ -7,17 +7,61 @@ from docx import Document
 import re
 from typing import Dict, List, Any, Optional
 import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import ahocorasick
+import logging
 
 
-import pytesseract
-from pdf2image import convert_from_bytes
+import cv2
+import numpy as np
+import tesserocr
+from PIL import Image
+
+# OCR runs in parallel, one page per task. tesserocr calls libtesseract in-process and releases
+# the GIL while recognizing, so plain threads spread the work across cores
+OCR_MAX_WORKERS = min(4, os.cpu_count() or 1)
+_ocr_executor = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+OCR_PAGE_MIN_CHARS = 20  # Pages with less extractable text than this are OCR'd
+OCR_DPI = 200
+OCR_THRESHOLD_BLOCK_SIZE = 31  # Neighbourhood (px) used to compute each pixel's threshold
+OCR_THRESHOLD_OFFSET = 10
+
+logger = logging.getLogger(__name__)
+
+def _render_page(page) -> Image.Image:
+    """
+    Rasterize a PDF page to a grayscale image and binarize it for OCR. Adaptive
+    thresholding evens out shading and faint scans so tesseract sees clean black-on-white text
+    """
+    pix = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+        OCR_THRESHOLD_BLOCK_SIZE, OCR_THRESHOLD_OFFSET
+    )
+    return Image.fromarray(binary)
+
+# Each OCR thread keeps its own tesseract engine (an engine is not thread-safe), so the
+# language model is loaded once per thread instead of once per page
+_ocr_local = threading.local()
+
+def _ocr_page(image: Image.Image) -> str:
+    """OCR one page image with this thread's tesseract engine"""
+    api = getattr(_ocr_local, "api", None)
+    if api is None:
+        api = _ocr_local.api = tesserocr.PyTessBaseAPI(lang="eng")
+    api.SetImage(image)
+    return api.GetUTF8Text()
 
 class CVParser:
     """Service for parsing and extracting information from CVs (all industries)"""
     
     # EXPANDED: Skills from ALL domains
-    UNIVERSAL_SKILLS = {
+    # Immutable: only read once, to build SKILL_AUTOMATON below
+    UNIVERSAL_SKILLS = frozenset({
         # === TECHNICAL/IT ===
         # Programming
         "python", "javascript", "typescript", "java", "c++", "c#", "go", "rust",
@@ -109,44 +153,91 @@ class CVParser:
         "conflict resolution", "presentation skills", "analytical skills",
         "attention to detail", "customer service", "multitasking",
         "decision making", "collaboration", "interpersonal skills"
-    }
+    })
     
     # Keep education keywords
-    EDUCATION_KEYWORDS = [
+    EDUCATION_KEYWORDS = (
         "bachelor", "master", "phd", "doctorate", "degree", "university",
         "college", "bsc", "msc", "ba", "ma", "mba", "engineering",
         "diploma", "certification", "associate", "graduate",
         "a level", "a-level", "gcse", "school", "sixth form", "academy"
-    ]
+    )
+    
+    # All skills in one Aho-Corasick automaton, built once at class load, so a CV is scanned in a
+    # single pass. Payload: (display name, length, single-word skill?, first char is word, last char is word)
+    # Single-word skills must sit on word boundaries (same rule as regex \b); multi-word skills match anywhere
+    SKILL_AUTOMATON = ahocorasick.Automaton()
+    for _skill in UNIVERSAL_SKILLS:
+        SKILL_AUTOMATON.add_word(_skill, (
+            _skill.title(), len(_skill), " " not in _skill,
+            _skill[0].isalnum() or _skill[0] == "_", _skill[-1].isalnum() or _skill[-1] == "_"
+        ))
+    SKILL_AUTOMATON.make_automaton()
+    del _skill
+    
+    # Industry keywords, matched as plain substrings of the CV text
+    INDUSTRY_KEYWORDS = {
+        "Software Engineering": ("python", "javascript", "react", "api", "git", "docker", "programming"),
+        "Data Science/AI": ("machine learning", "tensorflow", "data analysis", "statistics", "data science"),
+        "Healthcare": ("patient care", "clinical", "medical", "hipaa", "emr", "nursing", "healthcare"),
+        "Marketing": ("seo", "marketing", "content", "social media", "google analytics", "campaign"),
+        "Finance": ("financial", "accounting", "gaap", "audit", "excel", "budgeting", "finance"),
+        "Design": ("photoshop", "figma", "ui", "ux", "design", "visual", "graphic"),
+        "HR": ("recruitment", "hr", "hiring", "onboarding", "employee", "human resources"),
+        "Sales": ("sales", "crm", "lead generation", "b2b", "negotiation", "revenue"),
+        "Education": ("teaching", "curriculum", "classroom", "student", "education", "instructor")
+    }
+    
+    # Every industry keyword in one automaton, so a CV is scanned once rather than once per keyword
+    INDUSTRY_AUTOMATON = ahocorasick.Automaton()
+    for _keywords in INDUSTRY_KEYWORDS.values():
+        for _keyword in _keywords:
+            INDUSTRY_AUTOMATON.add_word(_keyword, _keyword)
+    INDUSTRY_AUTOMATON.make_automaton()
+    del _keywords, _keyword
+    
+    # Patterns compiled once at class load
+    EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+    # Improved phone regex: supports +44-XXXX-XXXXXX, +1 (234) 567-8901, etc.
+    PHONE_PATTERN = re.compile(r'(?:\+\d{1,3}[\s.-]?)?(?:\(?\d{2,4}\)?[\s.-]?)?\d{3,4}[\s.-]?\d{3,4}[\s.-]?\d{0,4}')
+    LINKEDIN_PATTERN = re.compile(r'linkedin\.com/in/[\w-]+')  # Searched in lowercased text
+    # Matches: 2020 - 2023, 2020 - Present, etc.
+    DATE_RANGE_PATTERN = re.compile(r'(\d{4})\s*[-–—]\s*(?:(\d{4})|present|current)', re.IGNORECASE)
+    PHONE_IN_NAME_PATTERN = re.compile(r'\d{3}[-.\s]?\d{3}')
+    # Any education keyword, matched as a plain substring of the lowercased text
+    EDUCATION_PATTERN = re.compile("|".join(map(re.escape, EDUCATION_KEYWORDS)))
     
     def parse_pdf(self, file_content: bytes) -> Dict[str, Any]:
         """Parse PDF with OCR fallback for image-only files"""
         try:
             doc = fitz.open(stream=file_content, filetype="pdf")
-            text = ""
-            for page in doc:
-                text += page.get_text()
+            page_texts = [page.get_text() for page in doc]
             page_count = len(doc)
-            doc.close()
             
-            # OCR Fallback: If text is minimal (<100 chars), try OCR
-            if len(text.strip()) < 100:
-                print("Low text density detected in PDF. Attempting OCR...")
+            # OCR Fallback: OCR only the pages with (almost) no text layer, e.g. scanned pages,
+            # and keep the extracted text of every other page
+            empty_pages = [i for i, page_text in enumerate(page_texts) if len(page_text.strip()) < OCR_PAGE_MIN_CHARS]
+            if empty_pages:
+                logger.info("No text layer on %d of %d PDF pages. Attempting OCR...", len(empty_pages), page_count)
                 try:
-                    images = convert_from_bytes(file_content)
-                    ocr_text = ""
-                    for i, image in enumerate(images):
-                        # Preprocessing: Convert to grayscale
-                        gray_image = image.convert('L')
-                        ocr_text += pytesseract.image_to_string(gray_image) + "\n"
+                    # Render from the already-open document (grayscale, so no separate conversion step)
+                    images = [_render_page(doc[i]) for i in empty_pages]
+                    # map() keeps page order
+                    ocr_texts = _ocr_executor.map(_ocr_page, images)
                     
-                    if len(ocr_text.strip()) > len(text.strip()):
-                        text = ocr_text
-                        print(f"OCR successful. Extracted {len(text)} characters.")
+                    ocr_chars = 0
+                    for i, ocr_text in zip(empty_pages, ocr_texts):
+                        if len(ocr_text.strip()) > len(page_texts[i].strip()):
+                            page_texts[i] = ocr_text + "\n"
+                            ocr_chars += len(ocr_text)
+                    logger.info("OCR successful. Extracted %d characters.", ocr_chars)
                 except Exception as ocr_e:
-                    print(f"OCR failed: {str(ocr_e)}")
+                    logger.warning("OCR failed: %s", ocr_e)
                     # Continue with whatever text we found originally
             
+            doc.close()
+            text = "".join(page_texts)
+            
             return {
                 "success": True,
                 "text": text,
@@ -214,32 +305,27 @@ class CVParser:
         Now works for technical, healthcare, marketing, finance, etc.
         """
         text_lower = text.lower()
-        found_skills = []
-        
-        for skill in self.UNIVERSAL_SKILLS:
-            if " " not in skill:
-                # Single-word skill: use word boundary
-                pattern = rf'\b{re.escape(skill)}\b'
-                if re.search(pattern, text_lower):
-                    found_skills.append(skill.title())
-            else:
-                # Multi-word skill: substring match
-                if skill in text_lower:
-                    found_skills.append(skill.title())
-        
-        return sorted(set(found_skills))
+        last = len(text_lower) - 1
+        found_skills = set()
+        
+        for end, (title, length, single_word, starts_word, ends_word) in self.SKILL_AUTOMATON.iter(text_lower):
+            if single_word:
+                # Word boundary check: the character outside each end must differ in "wordness"
+                start = end - length + 1
+                before = text_lower[start - 1] if start > 0 else " "
+                after = text_lower[end + 1] if end < last else " "
+                if (before.isalnum() or before == "_") == starts_word or (after.isalnum() or after == "_") == ends_word:
+                    continue
+            found_skills.add(title)
+        
+        return sorted(found_skills)
     
     def extract_contact_info(self, text: str) -> Dict[str, Optional[str]]:
         """Extract contact info - unchanged"""
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        email_match = re.search(email_pattern, text)
-        
-        # Improved phone regex: supports +44-XXXX-XXXXXX, +1 (234) 567-8901, etc.
-        phone_pattern = r'(?:\+\d{1,3}[\s.-]?)?(?:\(?\d{2,4}\)?[\s.-]?)?\d{3,4}[\s.-]?\d{3,4}[\s.-]?\d{0,4}'
-        phone_match = re.search(phone_pattern, text)
-        
-        linkedin_pattern = r'linkedin\.com/in/[\w-]+'
-        linkedin_match = re.search(linkedin_pattern, text.lower())
+        email_match = self.EMAIL_PATTERN.search(text)
+        phone_match = self.PHONE_PATTERN.search(text)
+        # Lowercasing and searching for the literal is much faster than a re.IGNORECASE search
+        linkedin_match = self.LINKEDIN_PATTERN.search(text.lower())
         
         return {
             "email": email_match.group() if email_match else None,
@@ -250,15 +336,25 @@ class CVParser:
     def extract_education(self, text: str) -> List[str]:
         """Extract education - unchanged"""
         lines = text.split("\n")
+        text_lower = text.lower()
         education_lines = []
         
-        for line in lines:
-            line_lower = line.lower().strip()
-            if any(keyword in line_lower for keyword in self.EDUCATION_KEYWORDS):
-                if len(line.strip()) > 10:
-                    education_lines.append(line.strip())
-        
-        return education_lines[:5]
+        # Jump straight to each keyword hit and take its whole line, then resume on the next line.
+        # Lines are looked up by number since lowercasing can change the length of the text
+        line_no = 0
+        pos = 0
+        match = self.EDUCATION_PATTERN.search(text_lower)
+        while match and len(education_lines) < 5:
+            line_no += text_lower.count("\n", pos, match.start())
+            line = lines[line_no].strip()
+            if len(line) > 10:
+                education_lines.append(line)
+            pos = text_lower.find("\n", match.end())
+            if pos == -1:
+                break
+            match = self.EDUCATION_PATTERN.search(text_lower, pos)
+        
+        return education_lines
     
     def extract_name(self, text: str) -> Optional[str]:
         """
@@ -268,7 +364,7 @@ class CVParser:
         
         for line in lines[:3]:
             # Skip lines with email or phone numbers
-            if "@" in line or re.search(r'\d{3}[-.\s]?\d{3}', line):
+            if "@" in line or self.PHONE_IN_NAME_PATTERN.search(line):
                 continue
             
             words = line.split()
@@ -286,9 +382,7 @@ class CVParser:
         Calculate total years of work experience from date ranges
         Looks for patterns like: "2020 - 2023" or "Jan 2020 - Present"
         """
-        # Pattern matches: 2020 - 2023, 2020 - Present, etc.
-        date_pattern = r'(\d{4})\s*[-–—]\s*(?:(\d{4})|present|current)'
-        matches = re.findall(date_pattern, text.lower())
+        matches = self.DATE_RANGE_PATTERN.findall(text)
         
         if not matches:
             return None
@@ -311,24 +405,11 @@ class CVParser:
         """
         Detect primary industry/domain based on skills and CV content
         """
-        text_lower = text.lower()
-        
-        industry_keywords = {
-            "Software Engineering": ["python", "javascript", "react", "api", "git", "docker", "programming"],
-            "Data Science/AI": ["machine learning", "tensorflow", "data analysis", "statistics", "data science"],
-            "Healthcare": ["patient care", "clinical", "medical", "hipaa", "emr", "nursing", "healthcare"],
-            "Marketing": ["seo", "marketing", "content", "social media", "google analytics", "campaign"],
-            "Finance": ["financial", "accounting", "gaap", "audit", "excel", "budgeting", "finance"],
-            "Design": ["photoshop", "figma", "ui", "ux", "design", "visual", "graphic"],
-            "HR": ["recruitment", "hr", "hiring", "onboarding", "employee", "human resources"],
-            "Sales": ["sales", "crm", "lead generation", "b2b", "negotiation", "revenue"],
-            "Education": ["teaching", "curriculum", "classroom", "student", "education", "instructor"]
-        }
+        found = {keyword for _, keyword in self.INDUSTRY_AUTOMATON.iter(text.lower())}
         
         scores = {}
-        for industry, keywords in industry_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            scores[industry] = score
+        for industry, keywords in self.INDUSTRY_KEYWORDS.items():
+            scores[industry] = sum(1 for keyword in keywords if keyword in found)
         
         # Return industry with highest score, or "General" if score too low
         detected = max(scores, key=scores.get)
@@ -0,0 +1,63 @@
+"""
+CV Store Service - Storage for parsed CVs between upload and generation
+Uses Redis when REDIS_URL is set (shared across workers), otherwise an in-process TTL cache
+"""
+import os
+import threading
+from typing import Dict, Any, Optional
+from cachetools import TTLCache
+import msgpack
+import redis.asyncio as redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+CV_STORE_MAX_AGE = 3600  # 1 hour in seconds
+CV_STORE_MAX_SIZE = 1024  # In-process fallback only
+
+
+class CVStore:
+    """Service for storing parsed CV data with expiry"""
+
+    KEY_PREFIX = "cv:"
+
+    def __init__(self):
+        self.redis_url = os.getenv("REDIS_URL", "")
+
+        if self.redis_url:
+            # Connections are opened lazily on first command
+            self.redis = redis.from_url(self.redis_url)
+            logger.info("CV store: using Redis")
+        else:
+            self.redis = None
+            logger.info("CV store: REDIS_URL not set, using in-process cache (single worker only)")
+
+        self._local = TTLCache(maxsize=CV_STORE_MAX_SIZE, ttl=CV_STORE_MAX_AGE)
+        self._lock = threading.RLock()  # TTLCache is not thread-safe
+
+    async def get(self, cv_id: str) -> Optional[Dict[str, Any]]:
+        """Get stored CV data, or None if missing or expired"""
+        if self.redis is None:
+            with self._lock:
+                return self._local.get(cv_id)
+
+        raw = await self.redis.get(self.KEY_PREFIX + cv_id)
+        return msgpack.unpackb(raw) if raw is not None else None
+
+    async def set(self, cv_id: str, data: Dict[str, Any]) -> None:
+        """Store CV data for CV_STORE_MAX_AGE seconds"""
+        if self.redis is None:
+            with self._lock:
+                self._local[cv_id] = data
+            return
+
+        await self.redis.set(self.KEY_PREFIX + cv_id, msgpack.packb(data), ex=CV_STORE_MAX_AGE)
+
+    async def aclose(self) -> None:
+        """Close the Redis connection pool (no-op for the in-process cache)"""
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+# Singleton instance
+cv_store = CVStore()
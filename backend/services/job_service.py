@@ -2,21 +2,31 @@
 Job Service - Reed API Integration
 Searches jobs from Reed.co.uk API (UK's largest job board)
 """
+import asyncio
 import httpx
+import orjson
 import os
 import base64
+from functools import cached_property
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+REED_TIMEOUT_SECONDS = 30.0
+REED_MAX_KEEPALIVE = 20
+
 
 class JobService:
     """Service for fetching jobs from Reed API"""
     
     BASE_URL = "https://www.reed.co.uk/api/1.0"
     
+    # Salary display templates; hourly rates keep pence, day rates and annual salaries don't
+    SALARY_EXACT = {True: "£{0:,.2f} {1}", False: "£{0:,.0f} {1}"}
+    SALARY_RANGE = {True: "£{0:,.2f} - £{2:,.2f} {1}", False: "£{0:,.0f} - £{2:,.0f} {1}"}
+    
     def __init__(self):
         self.api_key = os.getenv("REED_API_KEY", "")
         
@@ -26,6 +36,27 @@ class JobService:
         credentials = f"{self.api_key}:"
         self.auth_header = base64.b64encode(credentials.encode()).decode()
     
+    @cached_property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP/2 client, built on first use; keeps connections to Reed pooled
+        so each search doesn't pay a fresh TCP + TLS handshake
+        """
+        return httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            http2=True,
+            timeout=REED_TIMEOUT_SECONDS,
+            headers={"Authorization": f"Basic {self.auth_header}"},
+            limits=httpx.Limits(max_keepalive_connections=REED_MAX_KEEPALIVE)
+        )
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client (called on application shutdown)"""
+        # Don't build a client just to close it
+        client = self.__dict__.pop("client", None)
+        if client:
+            await client.aclose()
+    
     def _check_api_key(self) -> Optional[Dict[str, Any]]:
         """Check if API key exists, return error dict if not"""
         if not self.api_key:
@@ -46,7 +77,8 @@ class JobService:
         full_time: Optional[bool] = None,
         part_time: Optional[bool] = None,
         permanent: Optional[bool] = None,
-        contract: Optional[bool] = None
+        contract: Optional[bool] = None,
+        normalize: bool = True
     ) -> Dict[str, Any]:
         """
         Search for jobs using Reed API
@@ -61,6 +93,8 @@ class JobService:
             part_time: Filter for part-time positions
             permanent: Filter for permanent roles
             contract: Filter for contract positions
+            normalize: If False, skip normalization and return Reed's job objects
+                already serialized as a JSON array under "raw_bytes"
         
         Returns:
             Dictionary with job results and metadata
@@ -85,87 +119,92 @@ class JobService:
         # e.g. Page 1, limit 200 -> start at 0
         current_skip = (page - 1) * results_per_page
         
-        fetched_count = 0
+        params = {"keywords": query}
+        
+        if location:
+            params["locationName"] = location
+            params["distanceFromLocation"] = "0" # Strict location search (must be string for some APIs)
+            
+        # Add Reed API filters
+        if full_time is not None:
+            params["fullTime"] = str(full_time).lower()
+        if part_time is not None:
+            params["partTime"] = str(part_time).lower()
+        if permanent is not None:
+            params["permanent"] = str(permanent).lower()
+        if contract is not None:
+            params["contract"] = str(contract).lower()
+        
+        # e.g. limit 250 -> (0, 100), (100, 100), (200, 50)
+        batches = [
+            (current_skip + offset, min(MAX_PER_REQUEST, total_needed - offset))
+            for offset in range(0, total_needed, MAX_PER_REQUEST)
+        ]
+        
+        # Loop-invariant values for the per-job filter below
+        search_location = location.lower() if location else None
+        add_seen = seen_job_ids.add
+        add_job = all_jobs.append
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                while fetched_count < total_needed:
-                    # Determine how many to take in this batch
-                    remaining = total_needed - fetched_count
-                    take = min(remaining, MAX_PER_REQUEST)
-                    
-                    params = {
-                        "keywords": query,
-                        "resultsToTake": take,
-                        "resultsToSkip": current_skip + fetched_count
-                    }
-                    
-                    if location:
-                        params["locationName"] = location
-                        params["distanceFromLocation"] = "0" # Strict location search (must be string for some APIs)
-                        
-                    # Add Reed API filters
-                    if full_time is not None:
-                        params["fullTime"] = str(full_time).lower()
-                    if part_time is not None:
-                        params["partTime"] = str(part_time).lower()
-                    if permanent is not None:
-                        params["permanent"] = str(permanent).lower()
-                    if contract is not None:
-                        params["contract"] = str(contract).lower()
-                    
-                    headers = {
-                        "Authorization": f"Basic {self.auth_header}"
-                    }
-                    
-                    response = await client.get(
-                        f"{self.BASE_URL}/search",
-                        params=params,
-                        headers=headers
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    batch_jobs = data.get("results", [])
-                    total_found = data.get("totalResults", 0) # This is the global total
-                    
-                    if not batch_jobs:
-                        break # No more jobs available
-                    
-                    # Deduplicate and add
-                    for job in batch_jobs:
-                        job_id = str(job.get("jobId"))
-                        
-                        # Strict filtering: Reed API can be fuzzy
-                        
-                        # Strict location filtering: Reed API is fuzzy, so we verify client-side
-                        if location:
-                            job_location = job.get("locationName", "").lower()
-                            search_location = location.lower()
-                            # If the job's location does NOT contain the search term, skip it
-                            if search_location not in job_location:
-                                continue
-                            
-                        if job_id and job_id not in seen_job_ids:
-                            seen_job_ids.add(job_id)
-                            all_jobs.append(job)
-                        
-                    fetched_count += len(batch_jobs)
+            pages = []
+            if batches:
+                # The first batch alone says whether more pages exist: only fan out when it came back
+                # full, and then only for offsets below the total, so no quota goes on empty pages
+                first = await self._fetch_batch(params, *batches[0])
+                pages.append(first)
+                if len(first.get("results", [])) >= batches[0][1]:
+                    total_found = first.get("totalResults", 0)
+                    pages += await asyncio.gather(*(
+                        self._fetch_batch(params, skip, take) for skip, take in batches[1:] if skip < total_found
+                    ), return_exceptions=True)
+            
+            for (_, take), data in zip(batches, pages):
+                if isinstance(data, BaseException):
+                    # Keep the pages before a failed (e.g. throttled) one rather than failing the search
+                    logger.warning(f"Reed API: batch failed, returning the results before it: {data!r}")
+                    break
+                
+                batch_jobs = data.get("results", [])
+                total_found = data.get("totalResults", 0) # This is the global total
+                
+                if not batch_jobs:
+                    break # No more jobs available
+                
+                # Deduplicate and add
+                for job in batch_jobs:
+                    # Strict location filtering: Reed API is fuzzy, so we verify client-side
+                    # If the job's location does NOT contain the search term, skip it
+                    if search_location and search_location not in job.get("locationName", "").lower():
+                        continue
                     
-                    # If we got fewer than we asked for, we've reached the end
-                    if len(batch_jobs) < take:
-                        break
-                        
-                logger.info(f"Reed API: Fetched {len(all_jobs)} unique jobs (Total available: {total_found})")
+                    job_id = str(job.get("jobId"))
+                    if job_id and job_id not in seen_job_ids:
+                        add_seen(job_id)
+                        add_job(job)
                 
+                # If we got fewer than we asked for, we've reached the end
+                if len(batch_jobs) < take:
+                    break
+                    
+            logger.info(f"Reed API: Fetched {len(all_jobs)} unique jobs (Total available: {total_found})")
+            
+            if not normalize:
+                # Serialized once here so the route can send the bytes as-is
                 return {
                     "success": True,
                     "count": total_found,
-                    "page": page,
-                    "results_per_page": results_per_page,
-                    "jobs": [self._normalize_job(job) for job in all_jobs]
+                    "raw_bytes": orjson.dumps(all_jobs)
                 }
-                
+            
+            return {
+                "success": True,
+                "count": total_found,
+                "page": page,
+                "results_per_page": results_per_page,
+                "jobs": [self._normalize_job(job) for job in all_jobs]
+            }
+            
         except httpx.HTTPStatusError as e:
             logger.error(f"Reed API HTTP Error: {e.response.status_code}")
             return {
@@ -188,6 +227,15 @@ class JobService:
                 "jobs": []
             }
     
+    async def _fetch_batch(self, params: Dict[str, Any], skip: int, take: int) -> Dict[str, Any]:
+        """Fetch one batch of search results (at most 100) starting at the given offset"""
+        response = await self.client.get(
+            "/search",
+            params={**params, "resultsToTake": take, "resultsToSkip": skip}
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
     async def get_job_details(self, job_id: str) -> Dict[str, Any]:
         """
         Get detailed information about a specific job
@@ -203,25 +251,17 @@ class JobService:
         if error_check:
             return error_check
         
-        headers = {
-            "Authorization": f"Basic {self.auth_header}"
-        }
-        
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/jobs/{job_id}",
-                    headers=headers
-                )
-                response.raise_for_status()
-                job = response.json()
-                
-                logger.info(f"Reed API: Fetched details for job {job_id}")
-                
-                return {
-                    "success": True,
-                    "job": self._normalize_job(job, full_details=True)
-                }
+            response = await self.client.get(f"/jobs/{job_id}")
+            response.raise_for_status()
+            job = orjson.loads(response.content)
+            
+            logger.info(f"Reed API: Fetched details for job {job_id}")
+            
+            return {
+                "success": True,
+                "job": self._normalize_job(job, full_details=True)
+            }
         except httpx.HTTPStatusError as e:
             logger.error(f"Reed API error fetching job {job_id}: {e.response.status_code}")
             return {
@@ -237,45 +277,47 @@ class JobService:
     
     def _normalize_job(self, job: Dict[str, Any], full_details: bool = False) -> Dict[str, Any]:
         """Normalize Reed job data to our standard format"""
+        # Runs for every job in every search, so bind the lookup once
+        get = job.get
         
-        salary_min = job.get("minimumSalary")
-        salary_max = job.get("maximumSalary")
-        salary_display = self._format_salary(salary_min, salary_max)
-        
-        raw_date = job.get("date", "")
-        formatted_date = self._format_date(raw_date)
+        salary_min = get("minimumSalary")
+        salary_max = get("maximumSalary")
+        raw_date = get("date", "")
         
-        contract_time = "Unknown"
-        if job.get("fullTime") and job.get("partTime"):
+        full_time = get("fullTime")
+        part_time = get("partTime")
+        if full_time and part_time:
             contract_time = "Full Time / Part Time"
-        elif job.get("fullTime"):
+        elif full_time:
             contract_time = "Full Time"
-        elif job.get("partTime"):
+        elif part_time:
             contract_time = "Part Time"
+        else:
+            contract_time = "Unknown"
             
         normalized = {
-            "id": str(job.get("jobId", "")),
-            "title": job.get("jobTitle", "Unknown Title"),
-            "company": job.get("employerName", "Unknown Company"),
-            "location": job.get("locationName", "Unknown Location"),
-            "description": job.get("jobDescription", ""),
+            "id": str(get("jobId", "")),
+            "title": get("jobTitle", "Unknown Title"),
+            "company": get("employerName", "Unknown Company"),
+            "location": get("locationName", "Unknown Location"),
+            "description": get("jobDescription", ""),
             "salary_min": salary_min,
             "salary_max": salary_max,
-            "salary_display": salary_display,
-            "contract_type": job.get("contractType", ""),
+            "salary_display": self._format_salary(salary_min, salary_max),
+            "contract_type": get("contractType", ""),
             "contract_time": contract_time,
-            "category": job.get("jobType", ""),
-            "redirect_url": job.get("jobUrl", ""),
-            "created": formatted_date,
+            "category": get("jobType", ""),
+            "redirect_url": get("jobUrl", ""),
+            "created": self._format_date(raw_date),
             "date_display": raw_date,
-            "expiration_date": job.get("expirationDate", ""),
-            "posted_by": job.get("employerName", ""),
+            "expiration_date": get("expirationDate", ""),
+            "posted_by": get("employerName", ""),
             "source": "Reed.co.uk"
         }
         
         if full_details:
-            normalized["applications"] = job.get("applications", 0)
-            normalized["employer_profile_url"] = job.get("employerProfileUrl", "")
+            normalized["applications"] = get("applications", 0)
+            normalized["employer_profile_url"] = get("employerProfileUrl", "")
         
         return normalized
     
@@ -283,6 +325,19 @@ class JobService:
         """Convert Reed date format (DD/MM/YYYY) to ISO format"""
         if not date_str:
             return ""
+        # Fast path for the two fixed-width formats; fromisoformat is far cheaper than strptime
+        if len(date_str) == 10:
+            if date_str[2] == "/" and date_str[5] == "/":
+                iso = f"{date_str[6:]}-{date_str[3:5]}-{date_str[:2]}"
+            elif date_str[4] == "-" and date_str[7] == "-":
+                iso = date_str
+            else:
+                iso = None
+            if iso is not None and iso.replace("-", "").isdigit():
+                try:
+                    return datetime.fromisoformat(iso).isoformat()
+                except ValueError:
+                    return date_str
         try:
             parsed = datetime.strptime(date_str, "%d/%m/%Y")
             return parsed.isoformat()
@@ -293,6 +348,11 @@ class JobService:
             except ValueError:
                 return date_str
     
+    @staticmethod
+    def _salary_unit(amount: float) -> str:
+        """Guess the pay period from the amount"""
+        return "per hour" if amount < 100 else "per day" if amount < 1000 else "per annum"
+    
     def _format_salary(
         self,
         salary_min: Optional[float],
@@ -302,36 +362,17 @@ class JobService:
         if not salary_min and not salary_max:
             return "Salary not specified"
         
-        if salary_min and salary_max:
-            # Heuristics for salary duration
-            if salary_min < 100:
-                unit = "per hour"
-            elif salary_min < 1000:
-                unit = "per day"
-            else:
-                unit = "per annum"
-            
-            if salary_min == salary_max:
-                return f"£{salary_min:,.2f} {unit}" if unit == "per hour" else f"£{salary_min:,.0f} {unit}"
-            return f"£{salary_min:,.2f} - £{salary_max:,.2f} {unit}" if unit == "per hour" else f"£{salary_min:,.0f} - £{salary_max:,.0f} {unit}"
-        elif salary_min:
-            if salary_min < 100:
-                unit = "per hour"
-            elif salary_min < 1000:
-                unit = "per day"
-            else:
-                unit = "per annum"
-            return f"From £{salary_min:,.0f} {unit}"
-        else:
+        if not salary_max:
+            return f"From £{salary_min:,.0f} {self._salary_unit(salary_min)}"
+        if not salary_min:
             # If only max is present, we guess based on max
-            if salary_max < 100:
-                unit = "per hour"
-            elif salary_max < 1000:
-                unit = "per day"
-            else:
-                unit = "per annum"
-            return f"Up to £{salary_max:,.0f} {unit}"
-
+            return f"Up to £{salary_max:,.0f} {self._salary_unit(salary_max)}"
+        
+        unit = self._salary_unit(salary_min)
+        hourly = unit == "per hour"
+        if salary_min == salary_max:
+            return self.SALARY_EXACT[hourly].format(salary_min, unit)
+        return self.SALARY_RANGE[hourly].format(salary_min, unit, salary_max)
 
 # Singleton instance
 job_service = JobService()
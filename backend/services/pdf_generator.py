@@ -2,154 +2,290 @@
 PDF Generator Service
 Creates professional PDF documents for CVs and cover letters
 """
+import os
+from reportlab import rl_config
+
+# Attribute validation on ReportLab shapes is a development aid; skip it unless debugging PDF output.
+# Set before the imports below since reportlab.graphics reads it at import time
+if not os.getenv("NEUROARC_DEBUG_PDF"):
+    rl_config.shapeChecking = 0
+
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Flowable, Table, TableStyle
 from reportlab.lib.colors import HexColor, black
 from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY, TA_RIGHT
+from reportlab.lib.fonts import ps2tt, tt2ps
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
 import io
-from typing import Optional
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+import blake3
+import orjson
+
+# Repeat downloads of the same tailored CV (/cv/generate/pdf; the tailored JSON itself is cached by
+# the router) skip the ~12ms render. A CV PDF is ~4-5KB, so a full cache holds well under 1MB
+PDF_CACHE_MAX_SIZE = 32
 
 class HorizontalLine(Flowable):
     """Draws a horizontal line"""
-    def __init__(self, width=450):
+    def __init__(self, width: float = 450):
         Flowable.__init__(self)
         self.width = width
 
-    def draw(self):
+    def draw(self) -> None:
         self.canv.setStrokeColor(HexColor('#000000'))
         self.canv.setLineWidth(0.5)
         self.canv.line(0, 0, self.width, 0)
 
+# Stylesheet and custom styles are built once at import and shared by every PDF
+_STYLES = getSampleStyleSheet()
+
+# Custom styles - Latex-like
+_STYLES.add(ParagraphStyle(
+    name='CVTitle',
+    parent=_STYLES['Heading1'],
+    fontName='Times-Bold',
+    fontSize=24,
+    leading=28,
+    textColor=black,
+    alignment=TA_LEFT,
+    spaceAfter=6
+))
+
+_STYLES.add(ParagraphStyle(
+    name='CVSection',
+    parent=_STYLES['Heading2'],
+    fontName='Times-Bold',
+    fontSize=12,
+    leading=14,
+    textColor=black,
+    alignment=TA_LEFT,
+    spaceBefore=12,
+    spaceAfter=4,
+    textTransform='uppercase'
+))
+
+_STYLES.add(ParagraphStyle(
+    name='CVBody',
+    parent=_STYLES['Normal'],
+    fontName='Times-Roman',
+    fontSize=10,
+    leading=12,
+    textColor=black,
+    alignment=TA_LEFT
+))
+
+_STYLES.add(ParagraphStyle(
+    name='CVBullet',
+    parent=_STYLES['Normal'],
+    fontName='Times-Roman',
+    fontSize=10,
+    leading=12,
+    textColor=black,
+    alignment=TA_LEFT,
+    leftIndent=15,
+    firstLineIndent=0,
+    spaceAfter=2
+))
+
+# Right aligned style for dates
+_STYLES.add(ParagraphStyle(
+    name='CVDate',
+    parent=_STYLES['Normal'],
+    fontName='Times-Roman',
+    fontSize=10,
+    leading=12,
+    textColor=black,
+    alignment=TA_RIGHT
+))
+
+# Centered header styles
+_HEADER_NAME_STYLE = ParagraphStyle(
+    'HeaderName', parent=_STYLES['CVTitle'], alignment=1, fontSize=24, spaceAfter=4
+)
+_HEADER_CONTACT_STYLE = ParagraphStyle(
+    'HeaderContact', parent=_STYLES['Normal'], alignment=1, fontSize=10
+)
+
+# Page setup shared by every CV
+_DOC_KWARGS = dict(
+    pagesize=A4,
+    rightMargin=0.4*inch,
+    leftMargin=0.4*inch,
+    topMargin=0.4*inch,
+    bottomMargin=0.4*inch
+)
+
+# Load the metrics of every font the CV styles use now, rather than on the first PDF request
+# (Helvetica comes from the base 'Normal' style behind the contact line)
+for _font_name in ("Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic", "Helvetica"):
+    pdfmetrics.getFont(_font_name)
+del _font_name
+
+# Content width of the CV page and the split-header columns (title 3/4, date 1/4)
+_CONTENT_WIDTH = 7.27 * inch
+_SPLIT_COL_WIDTHS = (_CONTENT_WIDTH * 0.75, _CONTENT_WIDTH * 0.25)
+
+# Split headers that need a real Table all share one style
+_SPLIT_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0,0), (-1,-1), 'TOP'),
+    ('LEFTPADDING', (0,0), (-1,-1), 0),
+    ('RIGHTPADDING', (0,0), (-1,-1), 0),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 0),
+    ('TOPPADDING', (0,0), (-1,-1), 0),
+])
+
+# Left side of a split header that SplitLine can draw: plain text, optionally wrapped whole in <b> or <i>
+_SIMPLE_LEFT_TEXT = re.compile(r"<(b|i)>([^<>&]*)</\1>|([^<>&]*)")
+_PLAIN_TEXT = re.compile(r"[^<>&]*")
+
+# Markup templates for the per-entry loops, bound once instead of building an f-string each time
+_BOLD = "<b>{}</b>".format
+_ITALIC = "<i>{}</i>".format
+_ITALIC_SUFFIX = " | <i>{}</i>".format
+_BULLET = "• {}".format
+
+class SplitLine(Flowable):
+    """
+    Draws a one-line row with text on the left and right-aligned text on the right.
+    Lays out exactly like a two-cell, zero-padding Table of CVBody/CVDate paragraphs,
+    without going through the table engine
+    """
+    def __init__(self, left: str, left_font: str, right: str, width: float, style: ParagraphStyle):
+        Flowable.__init__(self)
+        self.left = left
+        self.left_font = left_font
+        self.right = right
+        self.width = width
+        self.style = style
+        self.hAlign = 'CENTER'  # Same placement as the Table it stands in for
+
+    def wrap(self, availWidth: float, availHeight: float) -> Tuple[float, float]:
+        return self.width, self.style.leading
+
+    def draw(self) -> None:
+        style = self.style
+        # Paragraphs put the first baseline one font size below the top of the line
+        baseline = style.leading - style.fontSize
+        self.canv.setFillColor(style.textColor)
+        self.canv.setFont(self.left_font, style.fontSize)
+        self.canv.drawString(0, baseline, self.left)
+        if self.right:
+            self.canv.setFont(style.fontName, style.fontSize)
+            self.canv.drawRightString(self.width, baseline, self.right)
+
+    @classmethod
+    def build(
+        cls, left_text: str, right_text: str, width: float, left_width: float, style: ParagraphStyle
+    ) -> Optional["SplitLine"]:
+        """
+        Return a SplitLine for the texts, or None if the row needs a real Table
+        (mixed markup or entities, an empty left side, or text that would wrap)
+        """
+        left_match = _SIMPLE_LEFT_TEXT.fullmatch(left_text)
+        if not left_match or not _PLAIN_TEXT.fullmatch(right_text):
+            return None
+        
+        tag = left_match.group(1)
+        # Paragraphs collapse runs of whitespace
+        left = " ".join((left_match.group(2) if tag else left_match.group(3)).split())
+        right = " ".join(right_text.split())
+        if not left:
+            return None
+        
+        family = ps2tt(style.fontName)[0]
+        left_font = tt2ps(family, tag == "b", tag == "i")
+        if (stringWidth(left, left_font, style.fontSize) >= left_width
+                or stringWidth(right, style.fontName, style.fontSize) >= width - left_width):
+            return None
+        return cls(left, left_font, right, width, style)
+
 class PDFGenerator:
     """Service for generating PDF documents"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        
-        # Custom styles - Latex-like
-        self.styles.add(ParagraphStyle(
-            name='CVTitle',
-            parent=self.styles['Heading1'],
-            fontName='Times-Bold',
-            fontSize=24,
-            leading=28,
-            textColor=black,
-            alignment=TA_LEFT,
-            spaceAfter=6
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CVSection',
-            parent=self.styles['Heading2'],
-            fontName='Times-Bold',
-            fontSize=12,
-            leading=14,
-            textColor=black,
-            alignment=TA_LEFT,
-            spaceBefore=12,
-            spaceAfter=4,
-            textTransform='uppercase'
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CVBody',
-            parent=self.styles['Normal'],
-            fontName='Times-Roman',
-            fontSize=10,
-            leading=12,
-            textColor=black,
-            alignment=TA_LEFT
-        ))
-
-        self.styles.add(ParagraphStyle(
-            name='CVBullet',
-            parent=self.styles['Normal'],
-            fontName='Times-Roman',
-            fontSize=10,
-            leading=12,
-            textColor=black,
-            alignment=TA_LEFT,
-            leftIndent=15,
-            firstLineIndent=0,
-            spaceAfter=2
-        ))
-        
-        # Right aligned style for dates
-        self.styles.add(ParagraphStyle(
-            name='CVDate',
-            parent=self.styles['Normal'],
-            fontName='Times-Roman',
-            fontSize=10,
-            leading=12,
-            textColor=black,
-            alignment=TA_RIGHT
-        ))
-
-    def generate_cv_from_json(self, data: dict) -> bytes:
+        self.styles = _STYLES
+        self._cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._lock = threading.Lock()  # generate_cv_from_json runs in the threadpool
+
+    def generate_cv_from_json(self, data: Dict[str, Any], out: Optional[BinaryIO] = None) -> Optional[bytes]:
         """
         Generate a professional CV PDF for ANY domain/industry.
         Adapts section titles and structure based on content.
+        
+        Returns the PDF bytes, or writes the PDF to `out` (e.g. an open file) and returns None.
+        PDFs are cached by CV content; this only serves repeat /cv/generate/pdf downloads of identical
+        CV data (the /cv/generate preview returns JSON and never renders a PDF)
         """
+        cache_key = blake3.blake3(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).digest()
+        with self._lock:
+            pdf = self._cache.get(cache_key)
+            if pdf is not None:
+                self._cache.move_to_end(cache_key)
+        
+        if pdf is None:
+            pdf = self._generate(data)
+            with self._lock:
+                self._cache[cache_key] = pdf
+                if len(self._cache) > PDF_CACHE_MAX_SIZE:
+                    self._cache.popitem(last=False)
+        
+        if out is not None:
+            out.write(pdf)
+            return None
+        return pdf
+
+    def _generate(self, data: Dict[str, Any]) -> bytes:
+        """Lay out and render the CV"""
         buffer = io.BytesIO()
         
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=0.4*inch,
-            leftMargin=0.4*inch,
-            topMargin=0.4*inch,
-            bottomMargin=0.4*inch
-        )
+        doc = SimpleDocTemplate(buffer, **_DOC_KWARGS)
         
-        flowables = []
+        flowables: List[Flowable] = []
         styles = self.styles
-        available_width = 7.27 * inch
+        available_width: float = _CONTENT_WIDTH
 
         # Helper functions
-        def add_split_header(left_text, right_text, is_bold_left=True):
+        def add_split_header(left_text: str, right_text: Optional[str], is_bold_left: bool = True) -> None:
+            # Most rows are a plain title and a date: draw those directly
+            line = SplitLine.build(
+                left_text, right_text or "", available_width, _SPLIT_COL_WIDTHS[0], styles['CVBody']
+            )
+            if line is not None:
+                flowables.append(line)
+                return
+            
             p_left = Paragraph(left_text, styles['CVBody'])
             p_right = Paragraph(right_text if right_text else "", styles['CVDate'])
             
-            t = Table(
-                [[p_left, p_right]], 
-                colWidths=[available_width * 0.75, available_width * 0.25]
-            )
-            t.setStyle(TableStyle([
-                ('VALIGN', (0,0), (-1,-1), 'TOP'),
-                ('LEFTPADDING', (0,0), (-1,-1), 0),
-                ('RIGHTPADDING', (0,0), (-1,-1), 0),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-                ('TOPPADDING', (0,0), (-1,-1), 0),
-            ]))
+            t = Table([[p_left, p_right]], colWidths=_SPLIT_COL_WIDTHS)
+            t.setStyle(_SPLIT_TABLE_STYLE)
             flowables.append(t)
 
-        def add_section(title):
+        def add_section(title: str) -> None:
             flowables.append(Paragraph(title.upper(), styles['CVSection']))
             flowables.append(HorizontalLine(width=510))
             flowables.append(Spacer(1, 4))
 
         # 1. HEADER
-        header = data.get("header", {})
+        header: Dict[str, Any] = data.get("header", {})
         if header.get("name"):
-            name_style = ParagraphStyle(
-                'HeaderName', parent=styles['CVTitle'], alignment=1, fontSize=24, spaceAfter=4
-            )
-            flowables.append(Paragraph(header["name"], name_style))
-            
-            contact_parts = []
-            if header.get("email"): contact_parts.append(header["email"])
-            if header.get("phone"): contact_parts.append(header["phone"])
-            if header.get("location"): contact_parts.append(header["location"])
-            if header.get("linkedin"): contact_parts.append("LinkedIn")
-            if header.get("github"): contact_parts.append("GitHub")
+            flowables.append(Paragraph(header["name"], _HEADER_NAME_STYLE))
             
-            contact_info = "  |  ".join(contact_parts)
-            contact_style = ParagraphStyle(
-                'HeaderContact', parent=styles['Normal'], alignment=1, fontSize=10
-            )
-            flowables.append(Paragraph(contact_info, contact_style))
+            # Each field looked up once; empty ones are dropped before joining
+            contact_info = "  |  ".join(filter(None, (
+                header.get("email"),
+                header.get("phone"),
+                header.get("location"),
+                "LinkedIn" if header.get("linkedin") else None,
+                "GitHub" if header.get("github") else None,
+            )))
+            flowables.append(Paragraph(contact_info, _HEADER_CONTACT_STYLE))
             flowables.append(Spacer(1, 8))
 
         # 2. PROFESSIONAL SUMMARY
@@ -159,23 +295,23 @@ class PDFGenerator:
             flowables.append(Spacer(1, 6))
 
         # 3. EDUCATION (Moved up as standard for all CVs)
-        education = data.get("education", [])
+        education: List[Dict[str, Any]] = data.get("education", [])
         if education:
             add_section("Education")
             for edu in education:
-                uni_text = f"<b>{edu.get('institution', '')}</b>"
+                uni_text = _BOLD(edu.get('institution', ''))
                 if edu.get('location'): 
                     uni_text += f", {edu['location']}"
                 
                 flowables.append(Paragraph(uni_text, styles['CVBody']))
                 
-                degree_text = f"<i>{edu.get('degree', '')}</i>"
+                degree_text = _ITALIC(edu.get('degree', ''))
                 date_text = edu.get('dates', '')
                 add_split_header(degree_text, date_text)
                 flowables.append(Spacer(1, 6))
 
         # 4. SKILLS (UNIVERSAL - adapts to any skill categories)
-        skills = data.get("skills", {})
+        skills: Dict[str, List[str]] = data.get("skills", {})
         if skills:
             # Dynamic section title based on content
             add_section("Core Competencies")
@@ -191,45 +327,45 @@ class PDFGenerator:
             flowables.append(Spacer(1, 6))
 
         # 5. WORK EXPERIENCE
-        experience = data.get("experience", [])
+        experience: List[Dict[str, Any]] = data.get("experience", [])
         if experience:
             add_section("Professional Experience")
             for job in experience:
-                title_text = f"<b>{job.get('title', '')}</b>"
+                title_text = _BOLD(job.get('title', ''))
                 date_text = job.get('dates', '')
                 add_split_header(title_text, date_text)
                 
                 company_text = job.get('company', '')
                 if job.get('location'):
-                    company_text += f" | <i>{job['location']}</i>"
+                    company_text += _ITALIC_SUFFIX(job['location'])
                 
                 flowables.append(Paragraph(company_text, styles['CVBody']))
                 
                 bullets = job.get("bullets", [])
                 for bullet in bullets:
-                    flowables.append(Paragraph(f"• {bullet}", styles['CVBullet']))
+                    flowables.append(Paragraph(_BULLET(bullet), styles['CVBullet']))
                 
                 flowables.append(Spacer(1, 8))
 
         # 6. PROJECTS (OPTIONAL - only include if present)
-        projects = data.get("projects", [])
+        projects: List[Dict[str, Any]] = data.get("projects", [])
         if projects:
             add_section("Projects")
             for proj in projects:
-                name_text = f"<b>{proj.get('name', '')}</b>"
+                name_text = _BOLD(proj.get('name', ''))
                 if proj.get('technologies'):
-                    name_text += f" | <i>{proj['technologies']}</i>"
+                    name_text += _ITALIC_SUFFIX(proj['technologies'])
                 
                 date_text = proj.get('dates', '')
                 add_split_header(name_text, date_text)
                 
                 if proj.get('description'):
-                    flowables.append(Paragraph(f"• {proj['description']}", styles['CVBullet']))
+                    flowables.append(Paragraph(_BULLET(proj['description']), styles['CVBullet']))
                 
                 flowables.append(Spacer(1, 4))
 
         # 7. CERTIFICATIONS & LICENSES
-        certifications = data.get("certifications", [])
+        certifications: List[Union[Dict[str, Any], str]] = data.get("certifications", [])
         if certifications:
             add_section("Certifications & Licenses")
             # Logic to handle both Strings (Legacy) and Objects (New)
@@ -252,27 +388,27 @@ class PDFGenerator:
                     add_split_header(left_text, right_text)
                 else:
                     # Fallback for strings
-                    flowables.append(Paragraph(f"• {cert}", styles['CVBody']))
+                    flowables.append(Paragraph(_BULLET(cert), styles['CVBody']))
             flowables.append(Spacer(1, 4))
 
         # 8. ADDITIONAL SECTIONS (if present in JSON)
         # Allows for custom sections like "Publications", "Volunteer Work", etc.
-        additional_sections = data.get("additional_sections", {})
+        additional_sections: Dict[str, Union[List[str], str]] = data.get("additional_sections", {})
         for section_title, section_content in additional_sections.items():
             add_section(section_title)
             if isinstance(section_content, list):
                 for item in section_content:
-                    flowables.append(Paragraph(f"• {item}", styles['CVBody']))
+                    flowables.append(Paragraph(_BULLET(item), styles['CVBody']))
             else:
                 flowables.append(Paragraph(section_content, styles['CVBody']))
-            flowables.append(Spacer(1, 4))
 
-            # Remove trailing spacers to prevent blank pages
-            while flowables and isinstance(flowables[-1], Spacer):
-                flowables.pop()
+        # Remove trailing spacers to prevent blank pages; checked once, after the last section,
+        # so it also covers CVs that end with any of the sections above
+        while flowables and isinstance(flowables[-1], Spacer):
+            flowables.pop()
 
         doc.build(flowables)
-        buffer.seek(0)
+        # getvalue() hands over the BytesIO's own buffer rather than copying it
         return buffer.getvalue()
 
 # Singleton instance
@@ -1,30 +1,148 @@
-import json
+import orjson
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+import threading
 import uuid
 
 # Define the data directory and file path
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-REVIEWS_FILE = os.path.join(DATA_DIR, "reviews.json")
+# Append-only log, one JSON object per line (oldest first); deletes are appended as tombstones
+REVIEWS_FILE = os.path.join(DATA_DIR, "reviews.jsonl")
+# Previous storage format (a single JSON array, newest first), migrated on first use
+LEGACY_REVIEWS_FILE = os.path.join(DATA_DIR, "reviews.json")
+MIGRATED_REVIEWS_FILE = LEGACY_REVIEWS_FILE + ".migrated"
+# Rewrite the log once this many tombstones have piled up
+COMPACT_THRESHOLD = 100
+
+# Serializes access to the log and the in-memory copy; callers run these functions in a threadpool
+_lock = threading.Lock()
+
+# Parsed reviews in log order (oldest first), valid while the log's (mtime, size) matches _cache_stamp.
+# Our own writes update it in place, so it is only re-read after changes made outside this process
+_reviews_cache: Optional[List[Dict[str, Any]]] = None
+_cache_stamp: Optional[Tuple[int, int]] = None
+_tombstones = 0
+_INITIALIZED = False
 
 def _ensure_data_file():
-    """Ensure the data directory and reviews file exist."""
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
+    """Ensure the data directory and reviews log exist, migrating a legacy reviews.json into an empty log."""
+    global _INITIALIZED
+    # Checked once per process rather than with filesystem calls on every request
+    if _INITIALIZED:
+        return
+    
+    with _lock:
+        if _INITIALIZED:
+            return
+        
+        os.makedirs(DATA_DIR, exist_ok=True)
+        
+        log_is_empty = not os.path.exists(REVIEWS_FILE) or os.path.getsize(REVIEWS_FILE) == 0
+        if log_is_empty and os.path.exists(LEGACY_REVIEWS_FILE):
+            # An empty log counts as missing: some checkouts shipped an empty reviews.jsonl
+            reviews = []
+            try:
+                with open(LEGACY_REVIEWS_FILE, 'rb') as f:
+                    reviews = orjson.loads(f.read())
+            except orjson.JSONDecodeError:
+                pass
+            _write_log(reversed(reviews))
+            # Set the old file aside so it is never imported again (e.g. once deletes empty the log)
+            os.replace(LEGACY_REVIEWS_FILE, MIGRATED_REVIEWS_FILE)
+        elif not os.path.exists(REVIEWS_FILE):
+            _write_log([])
+        
+        _INITIALIZED = True
+
+def _write_log(reviews, expected_stamp: Optional[Tuple[int, int]] = None) -> bool:
+    """
+    Atomically replace the log with the given reviews (oldest first). With expected_stamp, the
+    log is only replaced if it is still unchanged on disk, so entries appended by another
+    process since it was read are not lost; returns whether the log was replaced.
+    """
+    tmp_file = REVIEWS_FILE + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.writelines(orjson.dumps(review) + b"\n" for review in reviews)
+    if expected_stamp is not None and _stamp() != expected_stamp:
+        os.remove(tmp_file)
+        return False
+    os.replace(tmp_file, REVIEWS_FILE)
+    return True
+
+def _stamp() -> Tuple[int, int]:
+    stat = os.stat(REVIEWS_FILE)
+    return stat.st_mtime_ns, stat.st_size
+
+def _load() -> List[Dict[str, Any]]:
+    """Return the reviews (oldest first), re-reading the log only if it changed on disk. Call with _lock held."""
+    global _reviews_cache, _cache_stamp, _tombstones
+    stamp = _stamp()
+    if _reviews_cache is not None and stamp == _cache_stamp:
+        return _reviews_cache
     
-    if not os.path.exists(REVIEWS_FILE):
-        with open(REVIEWS_FILE, 'w') as f:
-            json.dump([], f)
+    reviews: Dict[str, Dict[str, Any]] = {}
+    tombstones = 0
+    with open(REVIEWS_FILE, 'rb') as f:
+        for line in f:
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue  # Blank or torn line (e.g. a crash mid-append)
+            if entry.get("_deleted"):
+                reviews.pop(entry.get("id"), None)
+                tombstones += 1
+            else:
+                reviews[entry.get("id")] = entry
+    
+    _reviews_cache = list(reviews.values())
+    _cache_stamp = stamp
+    _tombstones = tombstones
+    return _reviews_cache
+
+def _append(entry: Dict[str, Any]) -> None:
+    """Append an entry to the log and move the cache stamp past our own write. Call with _lock held."""
+    global _reviews_cache, _cache_stamp
+    line = orjson.dumps(entry) + b"\n"
+    # One O_APPEND write() per entry: the kernel appends the whole line at the end of the file
+    # even if another process is writing to the log, and no Python file buffering is involved
+    fd = os.open(REVIEWS_FILE, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        before = os.fstat(fd)
+        # A crash mid-append can leave a partial last line; start on a fresh line so ours isn't glued onto it
+        if before.st_size and os.pread(fd, 1, before.st_size - 1) != b"\n":
+            line = b"\n" + line
+        os.write(fd, line)
+        after = os.fstat(fd)
+    finally:
+        os.close(fd)
+    
+    # The cache still matches the log only if nobody else touched it since it was read and
+    # the file grew by exactly our line; otherwise drop it so the next _load re-reads everything
+    if (before.st_mtime_ns, before.st_size) == _cache_stamp and after.st_size == before.st_size + len(line):
+        _cache_stamp = after.st_mtime_ns, after.st_size
+    else:
+        _reviews_cache = None
+
+def compact() -> None:
+    """
+    Rewrite the log without tombstones or deleted reviews. Skipped if another process
+    writes to the log meanwhile; the next delete past the threshold tries again.
+    """
+    global _reviews_cache, _tombstones
+    _ensure_data_file()
+    with _lock:
+        reviews = _load()
+        if _write_log(reviews, expected_stamp=_cache_stamp):
+            _reviews_cache = None  # Re-read on next access against the new file's stamp
+            _tombstones = 0
 
 def get_all_reviews() -> List[Dict[str, Any]]:
     """Retrieve all reviews from storage."""
     _ensure_data_file()
-    try:
-        with open(REVIEWS_FILE, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return []
+    with _lock:
+        # Newest first; a copy, so a concurrent add/delete can't change it while it is being serialized
+        return _load()[::-1]
 
 def add_review(name: str, rating: int, comment: str) -> Dict[str, Any]:
     """Add a new review to storage."""
@@ -39,41 +157,31 @@ def add_review(name: str, rating: int, comment: str) -> Dict[str, Any]:
         "date": datetime.now().isoformat()
     }
     
-    # Read existing reviews
-    try:
-        with open(REVIEWS_FILE, 'r') as f:
-            reviews = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        reviews = []
-    
-    # Prepend new review (newest first)
-    reviews.insert(0, new_review)
+    with _lock:
+        reviews = _load()
+        # O(1) append instead of rewriting every review
+        _append(new_review)
+        reviews.append(new_review)
     
-    # Save back to file
-    with open(REVIEWS_FILE, 'w') as f:
-        json.dump(reviews, f, indent=2)
-        
     return new_review
 
 def delete_review(review_id: str) -> bool:
     """Delete a review by ID."""
+    global _tombstones
     _ensure_data_file()
     
-    try:
-        with open(REVIEWS_FILE, 'r') as f:
-            reviews = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return False
-    
-    # Filter out the review to delete
-    initial_count = len(reviews)
-    reviews = [r for r in reviews if r.get('id') != review_id]
-    
-    if len(reviews) == initial_count:
-        return False  # Review not found
-    
-    # Save changes
-    with open(REVIEWS_FILE, 'w') as f:
-        json.dump(reviews, f, indent=2)
+    with _lock:
+        reviews = _load()
+        index = next((i for i, r in enumerate(reviews) if r.get('id') == review_id), None)
+        if index is None:
+            return False  # Review not found
         
+        # Record the delete as a tombstone; the review is dropped from the log on compaction
+        _append({"id": review_id, "_deleted": True})
+        del reviews[index]
+        _tombstones += 1
+        needs_compaction = _tombstones >= COMPACT_THRESHOLD
+    
+    if needs_compaction:
+        compact()
     return True
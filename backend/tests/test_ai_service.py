@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import ai_service
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for the circuit breaker"""
+    now = [1000.0]
+    monkeypatch.setattr(ai_service, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    return ai_service.AIService()
+
+
+def open_circuit(service, model):
+    for _ in range(ai_service.LLM_BREAKER_THRESHOLD):
+        service._record_result(model, success=False)
+
+
+def test_circuit_opens_after_threshold_failures(service, clock):
+    for _ in range(ai_service.LLM_BREAKER_THRESHOLD - 1):
+        service._record_result("gpt-4o", success=False)
+    assert service._can_call("gpt-4o")
+
+    service._record_result("gpt-4o", success=False)
+    assert not service._can_call("gpt-4o")
+    assert service._can_call("gpt-4o-mini")
+
+
+def test_half_open_lets_one_probe_through(service, clock):
+    open_circuit(service, "gpt-4o")
+    clock[0] += ai_service.LLM_BREAKER_COOLDOWN_SECONDS
+
+    assert service._can_call("gpt-4o")  # The probe
+    assert not service._can_call("gpt-4o")  # Everyone else waits for its result
+    assert not service._can_call("gpt-4o")
+
+    service._record_result("gpt-4o", success=True)
+    assert service._can_call("gpt-4o")
+    assert service._can_call("gpt-4o")
+
+
+def test_failed_probe_rearms_cooldown(service, clock):
+    open_circuit(service, "gpt-4o")
+    clock[0] += ai_service.LLM_BREAKER_COOLDOWN_SECONDS
+    assert service._can_call("gpt-4o")
+
+    service._record_result("gpt-4o", success=False)
+    assert not service._can_call("gpt-4o")
+    clock[0] += ai_service.LLM_BREAKER_COOLDOWN_SECONDS - 1
+    assert not service._can_call("gpt-4o")
+
+    clock[0] += 1
+    assert service._can_call("gpt-4o")
+    assert not service._can_call("gpt-4o")
+
+
+class FakeClient:
+    """Chat client where gpt-4o never answers and gpt-4o-mini answers at once"""
+
+    async def complete(self, model, **kwargs):
+        if model == "gpt-4o":
+            await asyncio.Event().wait()
+        message = SimpleNamespace(content='{"ok": true}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+
+def test_cancelled_probe_is_released(service, clock):
+    service.__dict__["client"] = FakeClient()
+    open_circuit(service, "gpt-4o")
+    clock[0] += ai_service.LLM_BREAKER_COOLDOWN_SECONDS
+
+    # gpt-4o is let through as the probe, the hedge wins, and the probe is cancelled unanswered
+    result = asyncio.run(service._acall_llm("system", "user", json_mode=True, hedge_delay=0))
+    assert result == {"success": True, "data": {"ok": True}}
+
+    assert not service._breakers["gpt-4o"]["probing"]
+    assert service._can_call("gpt-4o")
@@ -0,0 +1,61 @@
+import orjson
+import pytest
+
+from services import review_service
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the review service at an empty data directory with fresh module state"""
+    monkeypatch.setattr(review_service, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(review_service, "REVIEWS_FILE", str(tmp_path / "reviews.jsonl"))
+    monkeypatch.setattr(review_service, "LEGACY_REVIEWS_FILE", str(tmp_path / "reviews.json"))
+    monkeypatch.setattr(review_service, "MIGRATED_REVIEWS_FILE", str(tmp_path / "reviews.json.migrated"))
+    monkeypatch.setattr(review_service, "_INITIALIZED", False)
+    monkeypatch.setattr(review_service, "_reviews_cache", None)
+    monkeypatch.setattr(review_service, "_cache_stamp", None)
+    monkeypatch.setattr(review_service, "_tombstones", 0)
+    return tmp_path
+
+
+LEGACY_REVIEWS = [  # Newest first, as reviews.json stored them
+    {"id": "b", "name": "Bob", "rating": 4, "comment": "Second review", "date": "2024-02-01T00:00:00"},
+    {"id": "a", "name": "Al", "rating": 5, "comment": "First review", "date": "2024-01-01T00:00:00"},
+]
+
+
+@pytest.mark.parametrize("empty_log", [False, True], ids=["no-log", "empty-log"])
+def test_legacy_reviews_survive_migration(data_dir, empty_log):
+    (data_dir / "reviews.json").write_bytes(orjson.dumps(LEGACY_REVIEWS))
+    if empty_log:
+        (data_dir / "reviews.jsonl").write_bytes(b"")
+
+    assert review_service.get_all_reviews() == LEGACY_REVIEWS
+
+    # The legacy file is set aside, and the reviews now come from the log
+    assert not (data_dir / "reviews.json").exists()
+    assert (data_dir / "reviews.json.migrated").exists()
+    review_service._reviews_cache = None
+    assert review_service.get_all_reviews() == LEGACY_REVIEWS
+
+
+def test_migrated_reviews_are_not_imported_again(data_dir, monkeypatch):
+    (data_dir / "reviews.json").write_bytes(orjson.dumps(LEGACY_REVIEWS))
+    monkeypatch.setattr(review_service, "COMPACT_THRESHOLD", 1)
+
+    assert review_service.delete_review("a")
+    assert review_service.delete_review("b")  # Compaction leaves an empty log
+    assert (data_dir / "reviews.jsonl").read_bytes() == b""
+
+    # A later process starts from the empty log without resurrecting the deleted reviews
+    review_service._INITIALIZED = False
+    review_service._reviews_cache = None
+    assert review_service.get_all_reviews() == []
+
+
+def test_add_and_delete_without_legacy_file(data_dir):
+    review = review_service.add_review("Cat", 5, "Great tool")
+    assert review_service.get_all_reviews() == [review]
+    assert review_service.delete_review(review["id"])
+    assert not review_service.delete_review(review["id"])
+    assert review_service.get_all_reviews() == []